@@ -1,267 +1,829 @@
 '''
-Business: User authentication and registration with JWT tokens
-Args: event with httpMethod (POST), body with email/password
-Returns: HTTP response with JWT token or error
+Business: User authentication and registration with short-lived JWT access tokens and rotating refresh tokens
+Args: event with httpMethod, body with email/password or refresh_token
+Returns: HTTP response with access and refresh tokens, the verified user, or error
 '''
 
+import hashlib
+import importlib
 import json
+import math
 import os
-import jwt
-import bcrypt
+import re
+import secrets
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'auth'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, Cache-Control',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+ROUTE_PATTERN = re.compile(r'/(register|login|verify|refresh|logout)(?![\w-])')
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', str(os.cpu_count() or 1)))
+BCRYPT_MAX_PENDING = int(os.environ.get('BCRYPT_MAX_PENDING', str(BCRYPT_WORKERS * 4)))
+
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+_bcrypt_slots = threading.BoundedSemaphore(BCRYPT_MAX_PENDING)
+
+
+class BcryptBusyError(HttpError):
+    '''Raised when the hashing queue is full and the request should be shed'''
+
+    def __init__(self):
+        super().__init__(429, 'Too many requests, try again later', {'Retry-After': '1'})
+
+
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '60'))
+PROFILE_CACHE_MAX_SIZE = int(os.environ.get('PROFILE_CACHE_MAX_SIZE', '10000'))
+
+
+class ProfileCache:
+    '''
+    In-process TTL cache of user profiles keyed by user_id.
+    Any object with the same get/set/delete methods can replace profile_cache
+    to share entries between containers.
+    '''
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[1]
+
+    def set(self, user_id: int, profile: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if len(self._entries) >= self.max_size:
+                del self._entries[next(iter(self._entries))]
+            self._entries[user_id] = (time.monotonic() + self.ttl_seconds, profile)
+
+    def delete(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+profile_cache = ProfileCache(PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_MAX_SIZE)
+_profile_cache_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'bypasses': 0}
+
+LOGIN_EMAIL_BURST = float(os.environ.get('LOGIN_EMAIL_BURST', '5'))
+LOGIN_EMAIL_PER_MINUTE = float(os.environ.get('LOGIN_EMAIL_PER_MINUTE', '2'))
+LOGIN_IP_BURST = float(os.environ.get('LOGIN_IP_BURST', '20'))
+LOGIN_IP_PER_MINUTE = float(os.environ.get('LOGIN_IP_PER_MINUTE', '10'))
+LOGIN_BUCKETS_MAX_SIZE = int(os.environ.get('LOGIN_BUCKETS_MAX_SIZE', '10000'))
+LOGIN_LIMITS_TTL_SECONDS = 24 * 3600
+LOGIN_LIMITS_PURGE_INTERVAL_SECONDS = 600
+
+REFILLED_TOKENS_SQL = (
+    "LEAST(EXCLUDED.capacity, l.tokens + "
+    "EXTRACT(EPOCH FROM CURRENT_TIMESTAMP - l.updated_at) * EXCLUDED.refill_per_second)"
+)
+
+
+class TokenBuckets:
+    '''
+    In-process token buckets keyed by string. They front the shared login_rate_limits
+    table: every attempt this container lets through is also charged there, so a
+    bucket that is empty here is empty globally and the attempt can be shed without
+    a database round trip.
+    '''
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        '''Spend one token; return 0 when allowed, otherwise seconds until a token is available'''
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            if len(self._buckets) >= self.max_size:
+                del self._buckets[next(iter(self._buckets))]
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / refill_per_second
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def set(self, key: str, tokens: float) -> None:
+        '''Adopt the shared bucket's level after the database has been consulted'''
+        with self._lock:
+            self._buckets.pop(key, None)
+            self._buckets[key] = (tokens, time.monotonic())
+
+
+login_buckets = TokenBuckets(LOGIN_BUCKETS_MAX_SIZE)
+_login_limiter_stats: Dict[str, int] = {'allowed': 0, 'shed_local': 0, 'shed_shared': 0}
+_login_limits_purged_at = 0.0
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get('ACCESS_TOKEN_TTL_SECONDS', '900'))
+REFRESH_TOKEN_TTL_DAYS = int(os.environ.get('REFRESH_TOKEN_TTL_DAYS', '30'))
+REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', '10'))
+SESSIONS_PURGE_INTERVAL_SECONDS = 600
+
+
+class RevocationSet:
+    '''
+    Ids of revoked access tokens that have not expired yet, mirrored from revoked_tokens.
+    Access tokens live ACCESS_TOKEN_TTL_SECONDS and expired rows are purged, so the set
+    stays small and an exact set is cheaper than a Bloom filter. Every unexpired row is
+    re-read at most every sync_seconds and replaces the set: serial ids are handed out
+    before commit, so a high-water mark would skip a revocation that commits after a
+    higher id was already seen. Between syncs verify never touches the database.
+    '''
+
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self._expires: Dict[str, float] = {}
+        self._added_during_sync: Dict[str, float] = {}
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, jti: str, expires_epoch: float) -> None:
+        with self._lock:
+            self._expires[jti] = expires_epoch
+            self._added_during_sync[jti] = expires_epoch
+
+    def contains(self, jti: str) -> bool:
+        if time.monotonic() - self._synced_at > self.sync_seconds:
+            self.sync()
+        return jti in self._expires
+
+    def sync(self) -> None:
+        with self._lock:
+            self._added_during_sync = {}
+        with db_cursor() as cursor:
+            cursor.execute(
+                "SELECT jti, expires_epoch FROM revoked_tokens WHERE expires_epoch > EXTRACT(EPOCH FROM CURRENT_TIMESTAMP)"
+            )
+            rows = cursor.fetchall()
+        expires = {row['jti']: row['expires_epoch'] for row in rows}
+        with self._lock:
+            # Local revocations committed after the read started are not in rows yet
+            expires.update(self._added_during_sync)
+            self._expires = expires
+            self._synced_at = time.monotonic()
+
+
+revoked_tokens = RevocationSet(REVOCATION_SYNC_SECONDS)
+_sessions_purged_at = 0.0
 
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-except ImportError:
-    psycopg2 = None
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    method: str = event.get('httpMethod', 'GET')
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
     
-    database_url = os.environ.get('DATABASE_URL')
-    jwt_secret = os.environ.get('JWT_SECRET', 'default_secret_key')
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
     
-    if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database not configured'}),
-            'isBase64Encoded': False
-        }
+    if method == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
     
-    conn = psycopg2.connect(database_url)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    route = ROUTES.get((method, resolve_path(event)))
+    if route is None:
+        return build_response(404, {'error': 'Not found'})
     
-    query_params = event.get('queryStringParameters', {}) or {}
-    raw_path = event.get('requestContext', {}).get('http', {}).get('path', '')
-    if not raw_path:
-        raw_path = query_params.get('path', '')
+    try:
+        return route(event)
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message}, e.headers)
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON body'})
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def register(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    email = body.get('email')
+    password = body.get('password')
+    full_name = body.get('full_name')
+    phone = body.get('phone')
     
-    path = ''
-    if '/register' in raw_path:
-        path = '/register'
-    elif '/login' in raw_path:
-        path = '/login'
-    elif '/verify' in raw_path:
-        path = '/verify'
+    if not email or not password:
+        raise HttpError(400, 'Email and password required')
     
-    if method == 'POST' and path == '/register':
-        body = json.loads(event.get('body', '{}'))
-        email = body.get('email')
-        password = body.get('password')
-        full_name = body.get('full_name')
-        phone = body.get('phone')
-        
-        if not email or not password:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Email and password required'}),
-                'isBase64Encoded': False
-            }
-        
+    with db_cursor() as cursor:
         cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
         if cursor.fetchone():
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'User already exists'}),
-                'isBase64Encoded': False
-            }
+            raise HttpError(400, 'User already exists')
         
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        password_hash = hash_password(password)
         
         cursor.execute(
             "INSERT INTO users (email, password_hash, full_name, phone) VALUES (%s, %s, %s, %s) RETURNING id, email, full_name, role",
             (email, password_hash, full_name, phone)
         )
         user = cursor.fetchone()
-        conn.commit()
-        
-        token = jwt.encode(
-            {
-                'user_id': user['id'],
-                'email': user['email'],
-                'role': user['role'],
-                'exp': datetime.utcnow() + timedelta(days=30)
-            },
-            jwt_secret,
-            algorithm='HS256'
-        )
-        
-        cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'token': token,
-                'user': {
-                    'id': user['id'],
-                    'email': user['email'],
-                    'full_name': user['full_name'],
-                    'role': user['role']
-                }
-            }),
-            'isBase64Encoded': False
+        session = issue_session(cursor, user)
+        cursor.connection.commit()
+    
+    return build_response(200, {
+        **session,
+        'user': {
+            'id': user['id'],
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'role': user['role']
         }
+    })
+
+
+def login(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    email = body.get('email')
+    password = body.get('password')
     
-    if method == 'POST' and path == '/login':
-        body = json.loads(event.get('body', '{}'))
-        email = body.get('email')
-        password = body.get('password')
-        
-        if not email or not password:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Email and password required'}),
-                'isBase64Encoded': False
-            }
-        
+    if not email or not password:
+        raise HttpError(400, 'Email and password required')
+    
+    limits = login_limits(event, email)
+    retry_after = max(login_buckets.take(key, capacity, rate) for key, capacity, rate in limits)
+    if retry_after:
+        _login_limiter_stats['shed_local'] += 1
+        raise login_throttled(retry_after)
+    
+    with db_cursor() as cursor:
         cursor.execute(
-            "SELECT id, email, password_hash, full_name, role, telegram_id, telegram_username FROM users WHERE email = %s",
-            (email,)
+            f"""WITH limits AS (
+                   INSERT INTO login_rate_limits AS l (key, tokens, capacity, refill_per_second)
+                   SELECT key, capacity - 1, capacity, refill_per_second
+                   FROM unnest(%s::text[], %s::float8[], %s::float8[]) AS t(key, capacity, refill_per_second)
+                   ON CONFLICT (key) DO UPDATE
+                   SET tokens = GREATEST({REFILLED_TOKENS_SQL} - 1, -1),
+                       capacity = EXCLUDED.capacity,
+                       refill_per_second = EXCLUDED.refill_per_second,
+                       updated_at = CURRENT_TIMESTAMP
+                   RETURNING key, tokens, refill_per_second
+               )
+               SELECT u.id, u.email, u.password_hash, u.full_name, u.role, u.telegram_id, u.telegram_username,
+                      (SELECT json_object_agg(key, tokens) FROM limits) as buckets,
+                      (SELECT max((1 - tokens) / refill_per_second) FROM limits WHERE tokens < 0) as retry_after
+               FROM (SELECT 1) one
+               LEFT JOIN users u ON u.email = %s""",
+            ([key for key, _, _ in limits], [c for _, c, _ in limits], [r for _, _, r in limits], email)
         )
         user = cursor.fetchone()
+        maybe_purge_login_limits(cursor)
+        cursor.connection.commit()
         
-        if not user or not bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8')):
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid credentials'}),
-                'isBase64Encoded': False
-            }
+        for key, tokens in user['buckets'].items():
+            login_buckets.set(key, tokens)
+        if user['retry_after']:
+            _login_limiter_stats['shed_shared'] += 1
+            raise login_throttled(user['retry_after'])
+        _login_limiter_stats['allowed'] += 1
         
-        token = jwt.encode(
-            {
-                'user_id': user['id'],
-                'email': user['email'],
-                'role': user['role'],
-                'exp': datetime.utcnow() + timedelta(days=30)
-            },
-            jwt_secret,
-            algorithm='HS256'
-        )
-        
-        cursor.close()
-        conn.close()
+        if user['id'] is None or not check_password(password, user['password_hash']):
+            raise HttpError(401, 'Invalid credentials')
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'token': token,
-                'user': {
-                    'id': user['id'],
-                    'email': user['email'],
-                    'full_name': user['full_name'],
-                    'role': user['role'],
-                    'telegram_id': user['telegram_id'],
-                    'telegram_username': user['telegram_username']
-                }
-            }),
-            'isBase64Encoded': False
+        if needs_rehash(user['password_hash']):
+            cursor.execute(
+                "UPDATE users SET password_hash = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s",
+                (hash_password(password), user['id'])
+            )
+        session = issue_session(cursor, user)
+        cursor.connection.commit()
+    
+    return build_response(200, {
+        **session,
+        'user': {
+            'id': user['id'],
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'role': user['role'],
+            'telegram_id': user['telegram_id'],
+            'telegram_username': user['telegram_username']
         }
+    })
+
+
+def login_limits(event: Dict[str, Any], email: str) -> List[Tuple[str, float, float]]:
+    '''Bucket key, capacity and refill rate for the email and, when known, the source IP'''
+    limits = [(f"email:{email.strip().lower()}", LOGIN_EMAIL_BURST, LOGIN_EMAIL_PER_MINUTE / 60)]
+    source_ip = source_ip_of(event)
+    if source_ip:
+        limits.append((f"ip:{source_ip}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60))
+    return limits
+
+
+def source_ip_of(event: Dict[str, Any]) -> str:
+    '''
+    Client address as seen by the gateway. Without one, fall back to the last
+    X-Forwarded-For hop, which the nearest proxy appends; earlier entries come from the
+    client and would let it pick a fresh rate-limit bucket on every attempt.
+    '''
+    request_context = event.get('requestContext', {}) or {}
+    source_ip = (request_context.get('identity', {}) or {}).get('sourceIp') or \
+        (request_context.get('http', {}) or {}).get('sourceIp')
+    if not source_ip:
+        headers = event.get('headers', {}) or {}
+        forwarded_for = headers.get('X-Forwarded-For') or headers.get('x-forwarded-for') or ''
+        source_ip = forwarded_for.split(',')[-1].strip()
+    return source_ip
+
+
+def login_throttled(retry_after: float) -> HttpError:
+    return HttpError(429, 'Too many login attempts, try again later', {'Retry-After': str(math.ceil(retry_after))})
+
+
+def maybe_purge_login_limits(cursor: Any) -> None:
+    '''Drop buckets idle long enough to have refilled, at most once per interval per container'''
+    global _login_limits_purged_at
+    now = time.monotonic()
+    if now - _login_limits_purged_at < LOGIN_LIMITS_PURGE_INTERVAL_SECONDS:
+        return
+    _login_limits_purged_at = now
+    cursor.execute(
+        "DELETE FROM login_rate_limits WHERE updated_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'",
+        (LOGIN_LIMITS_TTL_SECONDS,)
+    )
+
+
+def verify(event: Dict[str, Any]) -> Dict[str, Any]:
+    headers = event.get('headers', {}) or {}
+    auth_header = headers.get('X-Auth-Token') or headers.get('x-auth-token')
     
-    if method == 'GET' and path == '/verify':
-        auth_header = event.get('headers', {}).get('X-Auth-Token') or event.get('headers', {}).get('x-auth-token')
-        
-        if not auth_header:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'No token provided'}),
-                'isBase64Encoded': False
-            }
-        
-        try:
-            payload = jwt.decode(auth_header, jwt_secret, algorithms=['HS256'])
-            user_id = payload['user_id']
-            
+    if not auth_header:
+        raise HttpError(401, 'No token provided')
+    
+    jwt = lazy_import('jwt')
+    try:
+        payload = jwt.decode(auth_header, jwt_secret(), algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise HttpError(401, 'Token expired')
+    except jwt.InvalidTokenError:
+        raise HttpError(401, 'Invalid token')
+    
+    if 'jti' not in payload:
+        raise HttpError(401, 'Token expired')
+    if revoked_tokens.contains(payload['jti']):
+        raise HttpError(401, 'Token revoked')
+    
+    user_id = payload['user_id']
+    cache_control = headers.get('Cache-Control') or headers.get('cache-control') or ''
+    
+    if 'no-cache' in cache_control:
+        _profile_cache_stats['bypasses'] += 1
+        user = None
+    else:
+        user = profile_cache.get(user_id)
+        _profile_cache_stats['hits' if user is not None else 'misses'] += 1
+    
+    if user is None:
+        with db_cursor() as cursor:
             cursor.execute(
                 "SELECT id, email, full_name, role, telegram_id, telegram_username FROM users WHERE id = %s",
                 (user_id,)
             )
-            user = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
-            
-            if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'User not found'}),
-                    'isBase64Encoded': False
-                }
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'user': {
-                        'id': user['id'],
-                        'email': user['email'],
-                        'full_name': user['full_name'],
-                        'role': user['role'],
-                        'telegram_id': user['telegram_id'],
-                        'telegram_username': user['telegram_username']
-                    }
-                }),
-                'isBase64Encoded': False
-            }
-        except jwt.ExpiredSignatureError:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Token expired'}),
-                'isBase64Encoded': False
-            }
-        except jwt.InvalidTokenError:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid token'}),
-                'isBase64Encoded': False
-            }
+            row = cursor.fetchone()
+        
+        if not row:
+            profile_cache.delete(user_id)
+            raise HttpError(401, 'User not found')
+        
+        user = dict(row)
+        profile_cache.set(user_id, user)
+    
+    return build_response(200, {
+        'user': {
+            'id': user['id'],
+            'email': user['email'],
+            'full_name': user['full_name'],
+            'role': user['role'],
+            'telegram_id': user['telegram_id'],
+            'telegram_username': user['telegram_username']
+        }
+    })
+
+
+def refresh(event: Dict[str, Any]) -> Dict[str, Any]:
+    refresh_token = parse_body(event).get('refresh_token')
+    if not refresh_token:
+        raise HttpError(400, 'refresh_token required')
+    token_hash = hash_refresh_token(refresh_token)
+    
+    with db_cursor() as cursor:
+        cursor.execute(
+            """WITH spent AS (
+                   UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                   WHERE token_hash = %s AND revoked_at IS NULL AND expires_at > CURRENT_TIMESTAMP
+                   RETURNING user_id, family_id
+               )
+               SELECT u.id, u.email, u.role, spent.family_id
+               FROM spent
+               JOIN users u ON u.id = spent.user_id""",
+            (token_hash,)
+        )
+        user = cursor.fetchone()
+        
+        if user is None:
+            # A spent or unknown token: if it was stolen and already rotated, cut off the whole family
+            cursor.execute(
+                """UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                   WHERE revoked_at IS NULL
+                     AND family_id = (SELECT family_id FROM refresh_tokens WHERE token_hash = %s)""",
+                (token_hash,)
+            )
+            cursor.connection.commit()
+            raise HttpError(401, 'Invalid refresh token')
+        
+        session = issue_session(cursor, user, user['family_id'])
+        maybe_purge_sessions(cursor)
+        cursor.connection.commit()
+    
+    return build_response(200, session)
+
+
+def logout(event: Dict[str, Any]) -> Dict[str, Any]:
+    headers = event.get('headers', {}) or {}
+    access_token = headers.get('X-Auth-Token') or headers.get('x-auth-token')
+    refresh_token = parse_body(event).get('refresh_token')
     
-    cursor.close()
-    conn.close()
+    jwt = lazy_import('jwt')
+    try:
+        payload = jwt.decode(access_token, jwt_secret(), algorithms=['HS256'], options={'verify_exp': False}) \
+            if access_token else {}
+    except jwt.InvalidTokenError:
+        payload = {}
     
+    if not payload.get('jti') and not refresh_token:
+        return build_response(200, {'success': True})
+    
+    with db_cursor() as cursor:
+        if payload.get('jti'):
+            cursor.execute(
+                "INSERT INTO revoked_tokens (jti, expires_epoch) VALUES (%s, %s) ON CONFLICT (jti) DO NOTHING",
+                (payload['jti'], payload['exp'])
+            )
+        if refresh_token:
+            cursor.execute(
+                """UPDATE refresh_tokens SET revoked_at = CURRENT_TIMESTAMP
+                   WHERE revoked_at IS NULL
+                     AND family_id = (SELECT family_id FROM refresh_tokens WHERE token_hash = %s)""",
+                (hash_refresh_token(refresh_token),)
+            )
+        cursor.connection.commit()
+    
+    if payload.get('jti'):
+        revoked_tokens.add(payload['jti'], payload['exp'])
+    return build_response(200, {'success': True})
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    ('POST', '/register'): register,
+    ('POST', '/refresh'): refresh,
+    ('POST', '/logout'): logout,
+    ('POST', '/login'): login,
+    ('GET', '/verify'): verify
+}
+
+
+def resolve_path(event: Dict[str, Any]) -> str:
+    raw_path = event.get('requestContext', {}).get('http', {}).get('path', '')
+    if not raw_path:
+        raw_path = (event.get('queryStringParameters', {}) or {}).get('path', '')
+    match = ROUTE_PATTERN.search(raw_path)
+    return match.group(0) if match else ''
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body') or '{}')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return body
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=str)
     return {
-        'statusCode': 404,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Not found'}),
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': payload,
         'isBase64Encoded': False
-    }
\ No newline at end of file
+    }
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
+        
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
+        
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor() -> Iterator[Any]:
+    '''Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release'''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def jwt_secret() -> str:
+    return os.environ.get('JWT_SECRET', 'default_secret_key')
+
+
+def issue_token(user: Dict[str, Any]) -> str:
+    return lazy_import('jwt').encode(
+        {
+            'user_id': user['id'],
+            'email': user['email'],
+            'role': user['role'],
+            'jti': uuid.uuid4().hex,
+            'exp': datetime.utcnow() + timedelta(seconds=ACCESS_TOKEN_TTL_SECONDS)
+        },
+        jwt_secret(),
+        algorithm='HS256'
+    )
+
+
+def issue_session(cursor: Any, user: Dict[str, Any], family_id: Optional[str] = None) -> Dict[str, Any]:
+    '''Short-lived access token plus a new refresh token stored in the caller's transaction'''
+    refresh_token = secrets.token_urlsafe(32)
+    cursor.execute(
+        """INSERT INTO refresh_tokens (user_id, family_id, token_hash, expires_at)
+           VALUES (%s, %s, %s, CURRENT_TIMESTAMP + %s * INTERVAL '1 day')""",
+        (user['id'], family_id or uuid.uuid4().hex, hash_refresh_token(refresh_token), REFRESH_TOKEN_TTL_DAYS)
+    )
+    return {
+        'token': issue_token(user),
+        'refresh_token': refresh_token,
+        'expires_in': ACCESS_TOKEN_TTL_SECONDS
+    }
+
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode('utf-8')).hexdigest()
+
+
+def maybe_purge_sessions(cursor: Any) -> None:
+    '''Drop expired refresh tokens and revocations of expired access tokens, at most once per interval'''
+    global _sessions_purged_at
+    now = time.monotonic()
+    if now - _sessions_purged_at < SESSIONS_PURGE_INTERVAL_SECONDS:
+        return
+    _sessions_purged_at = now
+    cursor.execute("DELETE FROM refresh_tokens WHERE expires_at < CURRENT_TIMESTAMP")
+    cursor.execute("DELETE FROM revoked_tokens WHERE expires_epoch < EXTRACT(EPOCH FROM CURRENT_TIMESTAMP)")
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
+    return {
+        'db_pool': db_pool_stats(),
+        'login_limiter': login_limiter_stats(),
+        'profile_cache': profile_cache_stats()
+    }
+
+
+def hash_password(password: str) -> str:
+    bcrypt = lazy_import('bcrypt')
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
+    return _run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    bcrypt = lazy_import('bcrypt')
+    try:
+        return _run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    '''True when the stored hash was made with a cost other than BCRYPT_ROUNDS'''
+    try:
+        return int(password_hash.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def _run_bcrypt(fn: Any, *args: Any) -> Any:
+    if not _bcrypt_slots.acquire(blocking=False):
+        raise BcryptBusyError()
+    try:
+        with span('bcrypt'):
+            return _bcrypt_executor.submit(fn, *args).result()
+    finally:
+        _bcrypt_slots.release()
+
+
+def login_limiter_stats() -> Dict[str, Any]:
+    attempts = sum(_login_limiter_stats.values())
+    shed = _login_limiter_stats['shed_local'] + _login_limiter_stats['shed_shared']
+    return {**_login_limiter_stats, 'shed_rate': shed / attempts if attempts else 0.0}
+
+
+def profile_cache_stats() -> Dict[str, Any]:
+    lookups = _profile_cache_stats['hits'] + _profile_cache_stats['misses']
+    hit_rate = _profile_cache_stats['hits'] / lookups if lookups else 0.0
+    return {**_profile_cache_stats, 'hit_rate': hit_rate}
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
@@ -0,0 +1,370 @@
+'''
+Business: Manage a user's favorite products - list, bulk add/remove and full sync in one request
+Args: event with httpMethod (GET, POST, PUT), query param user_id or body with user_id, add, remove, product_ids
+Returns: HTTP response with the user's favorites joined with product data
+'''
+
+import importlib
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+FAVORITES_MAX_BATCH = 500
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'favorites'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
+    
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
+    
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+    
+    route = ROUTES.get(method)
+    if route is None:
+        return build_response(404, {'error': 'Not found'})
+    
+    try:
+        return route(event)
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message}, e.headers)
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON body'})
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def get_favorites(event: Dict[str, Any]) -> Dict[str, Any]:
+    user_id = parse_user_id((event.get('queryStringParameters', {}) or {}).get('user_id'))
+    return apply_favorites(user_id, [], [], sync=False)
+
+
+def change_favorites(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Bulk add and remove: {"user_id", "add": [product ids], "remove": [product ids]}'''
+    body = parse_body(event)
+    user_id = parse_user_id(body.get('user_id'))
+    remove = parse_product_ids(body.get('remove'))
+    removed = set(remove)
+    add = [product_id for product_id in parse_product_ids(body.get('add')) if product_id not in removed]
+    return apply_favorites(user_id, add, remove, sync=False)
+
+
+def sync_favorites(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''Replace the whole list, e.g. with the wishlist a guest built before logging in: {"user_id", "product_ids"}'''
+    body = parse_body(event)
+    user_id = parse_user_id(body.get('user_id'))
+    if 'product_ids' not in body:
+        raise HttpError(400, 'product_ids required')
+    return apply_favorites(user_id, parse_product_ids(body['product_ids']), [], sync=True)
+
+
+def apply_favorites(user_id: int, add: List[int], remove: List[int], sync: bool) -> Dict[str, Any]:
+    '''
+    Apply the changes and return the resulting list with product data in one statement.
+    WITH sub-statements share one snapshot, so the result is the rows that were already
+    there and survived the delete, plus the rows the insert returned.
+    Unknown and unlisted product ids are skipped rather than failing the whole batch.
+    '''
+    with db_cursor() as cursor:
+        cursor.execute(
+            """WITH removed AS (
+                   DELETE FROM favorites
+                   WHERE user_id = %(user_id)s
+                     AND (product_id = ANY(%(remove)s::int[]) OR (%(sync)s AND NOT product_id = ANY(%(add)s::int[])))
+                   RETURNING product_id
+               ), added AS (
+                   INSERT INTO favorites (user_id, product_id)
+                   SELECT %(user_id)s, p.id FROM products p WHERE p.id = ANY(%(add)s::int[]) AND p.listed
+                   ON CONFLICT (user_id, product_id) DO NOTHING
+                   RETURNING product_id, created_at
+               ), current AS (
+                   SELECT product_id, created_at FROM favorites
+                   WHERE user_id = %(user_id)s AND product_id NOT IN (SELECT product_id FROM removed)
+                   UNION ALL
+                   SELECT product_id, created_at FROM added
+               )
+               SELECT COALESCE(json_agg(json_build_object(
+                   'product_id', p.id,
+                   'name', p.name,
+                   'price', p.price::float8,
+                   'category', p.category,
+                   'image_url', p.image_url,
+                   'sizes', p.sizes,
+                   'stock', p.stock,
+                   'added_at', current.created_at
+               ) ORDER BY current.created_at DESC, p.id), '[]'::json)::text as favorites
+               FROM current
+               JOIN products p ON p.id = current.product_id""",
+            {'user_id': user_id, 'add': add, 'remove': remove, 'sync': sync}
+        )
+        favorites = cursor.fetchone()['favorites']
+        cursor.connection.commit()
+    
+    with span('serialize'):
+        body = f'{{"favorites":{favorites}}}'
+    return {'statusCode': 200, 'headers': JSON_HEADERS, 'body': body, 'isBase64Encoded': False}
+
+
+def parse_user_id(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HttpError(400, 'user_id required')
+
+
+def parse_product_ids(value: Any) -> List[int]:
+    if value is None:
+        return []
+    if not isinstance(value, list) or len(value) > FAVORITES_MAX_BATCH:
+        raise HttpError(400, f'Expected a list of at most {FAVORITES_MAX_BATCH} product ids')
+    try:
+        return list(dict.fromkeys(int(product_id) for product_id in value))
+    except (TypeError, ValueError):
+        raise HttpError(400, 'Product ids must be integers')
+
+
+ROUTES: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    'GET': get_favorites,
+    'POST': change_favorites,
+    'PUT': sync_favorites
+}
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body') or '{}')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return body
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=str)
+    return {
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': payload,
+        'isBase64Encoded': False
+    }
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
+        
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
+        
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor() -> Iterator[Any]:
+    '''Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release'''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
+    return {
+        'db_pool': db_pool_stats()
+    }
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
@@ -1,142 +1,342 @@
 '''
-Business: Manage orders - create, read, update status
+Business: Manage orders - create, read, export, summarize sales, update status (single or bulk) with Telegram notifications
 Args: event with httpMethod, body with order data or query params
-Returns: HTTP response with order data or list of orders
+Returns: HTTP response with order data, a page of orders with next_cursor, a long-polled feed of order changes, a sales summary or one chunk of a CSV/NDJSON export
 '''
 
+import base64
+import csv
+import hashlib
+import io
+import importlib
 import json
 import os
-from typing import Dict, Any
+import select
+import threading
+import time
+import traceback
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+ORDERS_PAGE_SIZE = 50
+ORDERS_PAGE_MAX_SIZE = 200
+
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = 300
+
+_idempotency_purged_at = 0.0
+
+ORDERS_CHANNEL = 'orders_changed'
+FEED_WAIT_SECONDS = 20.0
+FEED_MAX_WAIT_SECONDS = 25.0
+FEED_MAX_ORDERS = 200
+FEED_RECHECK_SECONDS = 0.5
+
+SALES_SUMMARY_DEFAULT_DAYS = 30
+SALES_SUMMARY_TOP_PRODUCTS = 20
+SALES_FOLD_INTERVAL_SECONDS = 60
+
+_sales_folded_at = 0.0
+
+EXPORT_FETCH_SIZE = 2000
+EXPORT_CHUNK_ORDERS = 5000
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+EXPORT_CSV_COLUMNS = [
+    'id', 'created_at', 'status', 'user_id', 'user_email',
+    'total_amount', 'payment_method', 'delivery_address', 'delivery_phone',
+    'product_id', 'product_name', 'product_price', 'quantity', 'selected_size'
+]
+
+ORDER_STATUS_LABELS = {
+    'pending': 'Ожидает',
+    'processing': 'В обработке',
+    'shipped': 'Отправлен',
+    'delivered': 'Доставлен',
+    'cancelled': 'Отменён'
+}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'orders'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, Idempotency-Key',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None, **details: Any):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+        self.details = details
 
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-except ImportError:
-    psycopg2 = None
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
+    
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
+    
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return PREFLIGHT_RESPONSE
     
-    database_url = os.environ.get('DATABASE_URL')
+    route = ROUTES.get(method)
+    if route is None:
+        return build_response(404, {'error': 'Not found'})
     
-    if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Database not configured'}),
-            'isBase64Encoded': False
-        }
-    
-    conn = psycopg2.connect(database_url)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    path = event.get('params', {}).get('path', '')
-    
-    if method == 'POST':
-        body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
-        items = body.get('items', [])
-        total_amount = body.get('total_amount')
-        delivery_address = body.get('delivery_address')
-        delivery_phone = body.get('delivery_phone')
-        payment_method = body.get('payment_method', 'card')
-        
-        if not items or not total_amount:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Items and total_amount required'}),
-                'isBase64Encoded': False
-            }
+    try:
+        return route(event)
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message, **e.details}, e.headers)
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON body'})
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def create_order(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    user_id = body.get('user_id')
+    items = body.get('items', [])
+    delivery_address = body.get('delivery_address')
+    delivery_phone = body.get('delivery_phone')
+    payment_method = body.get('payment_method', 'card')
+    
+    if not items:
+        raise HttpError(400, 'Items required')
+    try:
+        product_ids = [int(item['id']) for item in items]
+        quantities = [int(item['quantity']) for item in items]
+    except (KeyError, TypeError, ValueError):
+        raise HttpError(400, 'Each item needs a product id and quantity')
+    if min(quantities) < 1:
+        raise HttpError(400, 'Quantity must be positive')
+    
+    headers = event.get('headers', {}) or {}
+    idempotency_key = headers.get('Idempotency-Key') or headers.get('idempotency-key')
+    
+    with db_cursor() as cursor:
+        if idempotency_key:
+            replay = claim_idempotency_key(cursor, idempotency_key, body)
+            if replay is not None:
+                return replay
         
         cursor.execute(
-            """INSERT INTO orders (user_id, total_amount, delivery_address, delivery_phone, payment_method, status) 
-               VALUES (%s, %s, %s, %s, %s, %s) RETURNING id, created_at""",
-            (user_id, total_amount, delivery_address, delivery_phone, payment_method, 'pending')
+            """WITH lines AS (
+                   SELECT * FROM unnest(%s::int[], %s::int[], %s::text[]) WITH ORDINALITY
+                       AS l(product_id, quantity, selected_size, line_no)
+               ), requested AS (
+                   SELECT product_id, sum(quantity)::int as quantity FROM lines GROUP BY product_id
+               ), locked AS MATERIALIZED (
+                   SELECT p.id FROM products p
+                   JOIN requested r ON r.product_id = p.id
+                   ORDER BY p.id
+                   FOR UPDATE OF p
+               ), reserved AS (
+                   UPDATE products p SET stock = p.stock - r.quantity
+                   FROM requested r
+                   JOIN locked ON locked.id = r.product_id
+                   WHERE p.id = r.product_id AND p.stock >= r.quantity
+                   RETURNING p.id, p.name, p.price
+               ), new_order AS (
+                   INSERT INTO orders (user_id, total_amount, delivery_address, delivery_phone, payment_method, status)
+                   SELECT %s, (SELECT sum(p.price * l.quantity) FROM lines l JOIN reserved p ON p.id = l.product_id),
+                          %s, %s, %s, 'pending'
+                   WHERE (SELECT count(*) FROM reserved) = (SELECT count(*) FROM requested)
+                   RETURNING id, created_at, total_amount
+               ), new_items AS (
+                   INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity, selected_size)
+                   SELECT new_order.id, l.product_id, p.name, p.price, l.quantity, l.selected_size
+                   FROM new_order, lines l
+                   JOIN reserved p ON p.id = l.product_id
+                   ORDER BY l.line_no
+               ), new_notifications AS (
+                   INSERT INTO telegram_outbox (chat_id, order_id)
+                   SELECT u.telegram_id, new_order.id
+                   FROM new_order, users u
+                   WHERE u.role = 'admin' AND u.telegram_id IS NOT NULL
+               )
+               SELECT new_order.id, new_order.created_at, new_order.total_amount,
+                   ARRAY(
+                       SELECT r.product_id FROM requested r
+                       LEFT JOIN reserved p ON p.id = r.product_id
+                       WHERE p.id IS NULL
+                       ORDER BY r.product_id
+                   ) as unavailable
+               FROM (SELECT 1) as one
+               LEFT JOIN new_order ON TRUE""",
+            (
+                product_ids, quantities, [item.get('selectedSize') for item in items],
+                user_id, delivery_address, delivery_phone, payment_method
+            )
         )
         order = cursor.fetchone()
-        order_id = order['id']
         
-        for item in items:
-            cursor.execute(
-                """INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity, selected_size)
-                   VALUES (%s, %s, %s, %s, %s, %s)""",
-                (order_id, item.get('id'), item.get('name'), item.get('price'), item.get('quantity'), item.get('selectedSize'))
-            )
+        if order['id'] is None:
+            cursor.connection.rollback()
+            raise HttpError(409, 'Some items are out of stock', unavailable=order['unavailable'])
         
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'order_id': order_id,
-                'created_at': order['created_at'].isoformat() if order['created_at'] else None,
-                'status': 'pending'
-            }),
-            'isBase64Encoded': False
-        }
-    
-    if method == 'GET':
-        query_params = event.get('queryStringParameters', {}) or {}
-        user_id = query_params.get('user_id')
-        order_id = query_params.get('order_id')
-        
-        if order_id:
+        response = build_response(200, {
+            'order_id': order['id'],
+            'created_at': order['created_at'].isoformat() if order['created_at'] else None,
+            'total_amount': order['total_amount'],
+            'status': 'pending'
+        })
+        if idempotency_key:
             cursor.execute(
-                """SELECT o.*, 
-                   json_agg(json_build_object(
-                       'id', oi.id,
-                       'product_name', oi.product_name,
-                       'product_price', oi.product_price,
-                       'quantity', oi.quantity,
-                       'selected_size', oi.selected_size
-                   )) as items
-                   FROM orders o
-                   LEFT JOIN order_items oi ON o.id = oi.order_id
-                   WHERE o.id = %s
-                   GROUP BY o.id""",
-                (order_id,)
+                "UPDATE idempotency_keys SET status_code = %s, response_body = %s WHERE key = %s",
+                (response['statusCode'], response['body'], idempotency_key)
             )
-            order = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if order:
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps(dict(order), default=str),
-                    'isBase64Encoded': False
-                }
-            else:
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Order not found'}),
-                    'isBase64Encoded': False
-                }
-        
-        if user_id:
-            cursor.execute(
-                """SELECT o.*, 
+            maybe_purge_idempotency_keys(cursor)
+        cursor.connection.commit()
+    
+    return response
+
+
+def claim_idempotency_key(cursor: Any, key: str, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    '''
+    Claim the key inside the caller's transaction, or return the stored response of
+    the request that already completed with it. A concurrent duplicate blocks on the
+    primary key until the first transaction ends; if that one rolled back the key is
+    free again and the duplicate proceeds on its own.
+    '''
+    request_hash = hashlib.sha256(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()
+    cursor.execute(
+        """INSERT INTO idempotency_keys (key, request_hash) VALUES (%s, %s)
+           ON CONFLICT (key) DO UPDATE
+           SET request_hash = EXCLUDED.request_hash, status_code = NULL, response_body = NULL, created_at = CURRENT_TIMESTAMP
+           WHERE idempotency_keys.created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+           RETURNING key""",
+        (key, request_hash, IDEMPOTENCY_KEY_TTL_SECONDS)
+    )
+    if cursor.fetchone():
+        return None
+    
+    cursor.execute("SELECT request_hash, status_code, response_body FROM idempotency_keys WHERE key = %s", (key,))
+    stored = cursor.fetchone()
+    if stored is None or stored['status_code'] is None:
+        raise HttpError(
+            409, 'A request with this Idempotency-Key is in progress',
+            {'Retry-After': '1', 'Access-Control-Expose-Headers': 'Retry-After'}
+        )
+    if stored['request_hash'] != request_hash:
+        raise HttpError(422, 'Idempotency-Key was already used for a different request')
+    
+    return {
+        'statusCode': stored['status_code'],
+        'headers': {**JSON_HEADERS, 'Idempotent-Replayed': 'true'},
+        'body': stored['response_body'],
+        'isBase64Encoded': False
+    }
+
+
+def maybe_purge_idempotency_keys(cursor: Any) -> None:
+    '''Delete a bounded batch of expired keys at most once per IDEMPOTENCY_PURGE_INTERVAL_SECONDS per container'''
+    global _idempotency_purged_at
+    now = time.monotonic()
+    if now - _idempotency_purged_at < IDEMPOTENCY_PURGE_INTERVAL_SECONDS:
+        return
+    _idempotency_purged_at = now
+    cursor.execute(
+        """DELETE FROM idempotency_keys WHERE key IN (
+               SELECT key FROM idempotency_keys
+               WHERE created_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'
+               LIMIT 1000
+           )""",
+        (IDEMPOTENCY_KEY_TTL_SECONDS,)
+    )
+
+
+def get_orders(event: Dict[str, Any]) -> Dict[str, Any]:
+    query_params = event.get('queryStringParameters', {}) or {}
+    if query_params.get('order_id'):
+        return get_order(query_params['order_id'])
+    if query_params.get('export'):
+        return export_orders(event, query_params)
+    if query_params.get('summary') == 'sales':
+        return get_sales_summary(query_params)
+    if query_params.get('feed') == 'orders':
+        return get_order_feed(query_params)
+    return list_orders(query_params)
+
+
+def get_order(order_id: str) -> Dict[str, Any]:
+    with db_cursor() as cursor:
+        cursor.execute(
+            """SELECT row_to_json(r)::text as doc FROM (
+                   SELECT o.*, 
                    json_agg(json_build_object(
                        'id', oi.id,
                        'product_name', oi.product_name,
@@ -146,84 +346,631 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                    )) as items
                    FROM orders o
                    LEFT JOIN order_items oi ON o.id = oi.order_id
-                   WHERE o.user_id = %s
+                   WHERE o.id = %s
                    GROUP BY o.id
-                   ORDER BY o.created_at DESC""",
-                (user_id,)
-            )
+               ) r""",
+            (order_id,)
+        )
+        order = cursor.fetchone()
+    
+    if not order:
+        raise HttpError(404, 'Order not found')
+    return encoded_response(200, order['doc'])
+
+
+def order_filters(query_params: Dict[str, str]) -> Tuple[str, List[Any]]:
+    '''Build the WHERE clause shared by the paged list and the export from user_id/status/date_from/date_to'''
+    conditions: List[str] = []
+    params: List[Any] = []
+    try:
+        if query_params.get('user_id'):
+            conditions.append('o.user_id = %s')
+            params.append(int(query_params['user_id']))
+        if query_params.get('status'):
+            conditions.append('o.status = %s')
+            params.append(query_params['status'])
+        if query_params.get('date_from'):
+            conditions.append('o.created_at >= %s')
+            params.append(datetime.fromisoformat(query_params['date_from']))
+        if query_params.get('date_to'):
+            date_to = datetime.fromisoformat(query_params['date_to'])
+            if len(query_params['date_to']) == 10:
+                date_to += timedelta(days=1)
+            conditions.append('o.created_at < %s')
+            params.append(date_to)
+    except ValueError:
+        raise HttpError(400, 'Invalid filter or cursor')
+    
+    return ('WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+def list_orders(query_params: Dict[str, str]) -> Dict[str, Any]:
+    user_id = query_params.get('user_id')
+    where, params = order_filters(query_params)
+    
+    try:
+        limit = min(max(int(query_params.get('limit', ORDERS_PAGE_SIZE)), 1), ORDERS_PAGE_MAX_SIZE)
+        if query_params.get('cursor'):
+            where += (' AND ' if where else 'WHERE ') + '(o.created_at, o.id) < (%s, %s)'
+            params.extend(decode_cursor(query_params['cursor']))
+    except ValueError:
+        raise HttpError(400, 'Invalid filter or cursor')
+    
+    user_columns = '' if user_id else ', u.email as user_email, u.full_name as user_name'
+    user_join = '' if user_id else 'LEFT JOIN users u ON o.user_id = u.id'
+    
+    with db_cursor() as cursor:
+        cursor.execute(
+            f"""SELECT r.created_at, r.id, row_to_json(r)::text as doc FROM (
+                   SELECT o.*{user_columns}, COALESCE(i.items, '[]'::json) as items
+                   FROM (
+                       SELECT * FROM orders o
+                       {where}
+                       ORDER BY o.created_at DESC, o.id DESC
+                       LIMIT %s
+                   ) o
+                   {user_join}
+                   LEFT JOIN LATERAL (
+                       SELECT json_agg(json_build_object(
+                           'id', oi.id,
+                           'product_name', oi.product_name,
+                           'product_price', oi.product_price,
+                           'quantity', oi.quantity,
+                           'selected_size', oi.selected_size
+                       ) ORDER BY oi.id) as items
+                       FROM order_items oi
+                       WHERE oi.order_id = o.id
+                   ) i ON TRUE
+               ) r
+               ORDER BY r.created_at DESC, r.id DESC""",
+            (*params, limit + 1)
+        )
+        orders = cursor.fetchall()
+    
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1]['created_at'], orders[-1]['id'])
+    
+    with span('serialize'):
+        documents = ','.join(order['doc'] for order in orders)
+    return encoded_response(200, f'{{"orders":[{documents}],"next_cursor":{json.dumps(next_cursor)}}}')
+
+
+def export_orders(event: Dict[str, Any], query_params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Export the orders matching the filters, oldest first, as NDJSON (one order with its
+    items per line) or CSV (one line per item), at most EXPORT_CHUNK_ORDERS orders per
+    call. When more follow, the X-Next-Cursor header carries the keyset cursor for the
+    next call, and the client appends the chunks; only the first chunk of a CSV has the
+    header row. Rows are pulled through a named server-side cursor EXPORT_FETCH_SIZE at
+    a time and written straight into the encoder, gzip-compressed on the fly when the
+    client accepts it, so memory is bounded by one chunk whatever the date range.
+    '''
+    export_format = query_params['export']
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise HttpError(400, 'export must be csv or ndjson')
+    where, params = order_filters(query_params)
+    try:
+        if query_params.get('cursor'):
+            where += (' AND ' if where else 'WHERE ') + '(o.created_at, o.id) > (%s, %s)'
+            params.extend(decode_cursor(query_params['cursor']))
+    except ValueError:
+        raise HttpError(400, 'Invalid filter or cursor')
+    
+    headers = event.get('headers', {}) or {}
+    accept_encoding = headers.get('Accept-Encoding') or headers.get('accept-encoding') or ''
+    sink = ExportSink(gzip_output='gzip' in accept_encoding)
+    writer = csv.writer(sink) if export_format == 'csv' else None
+    if writer and not query_params.get('cursor'):
+        writer.writerow(EXPORT_CSV_COLUMNS)
+    
+    next_cursor = None
+    with db_cursor(name='orders_export') as cursor:
+        cursor.itersize = EXPORT_FETCH_SIZE
+        cursor.execute(
+            f"""SELECT {'*' if writer else 'row_to_json(r)::text as doc, r.created_at, r.id'} FROM (
+                   SELECT o.id, o.created_at, o.status, o.user_id, u.email as user_email,
+                          o.total_amount, o.payment_method, o.delivery_address, o.delivery_phone,
+                          COALESCE(i.items, '[]'::json) as items
+                   FROM (
+                       SELECT * FROM orders o
+                       {where}
+                       ORDER BY o.created_at, o.id
+                       LIMIT %s
+                   ) o
+                   LEFT JOIN users u ON o.user_id = u.id
+                   LEFT JOIN LATERAL (
+                       SELECT json_agg(json_build_object(
+                           'product_id', oi.product_id,
+                           'product_name', oi.product_name,
+                           'product_price', oi.product_price,
+                           'quantity', oi.quantity,
+                           'selected_size', oi.selected_size
+                       ) ORDER BY oi.id) as items
+                       FROM order_items oi
+                       WHERE oi.order_id = o.id
+                   ) i ON TRUE
+               ) r
+               ORDER BY r.created_at, r.id""",
+            (*params, EXPORT_CHUNK_ORDERS + 1)
+        )
+        for written, order in enumerate(cursor):
+            if written == EXPORT_CHUNK_ORDERS:
+                next_cursor = encode_cursor(last_created_at, last_id)
+                break
+            last_created_at, last_id = order['created_at'], order['id']
+            if writer:
+                order_columns = [order[column] for column in EXPORT_CSV_COLUMNS[:9]]
+                for item in order['items'] or [{}]:
+                    writer.writerow(order_columns + [item.get(column) for column in EXPORT_CSV_COLUMNS[9:]])
+            else:
+                sink.write(order['doc'])
+                sink.write('\n')
+    
+    filename = f"orders-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    response_headers = {
+        'Content-Type': EXPORT_CONTENT_TYPES[export_format],
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Expose-Headers': 'Content-Disposition, X-Next-Cursor'
+    }
+    if next_cursor:
+        response_headers['X-Next-Cursor'] = next_cursor
+    if sink.gzip_output:
+        response_headers['Content-Encoding'] = 'gzip'
+    return {
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': sink.getvalue(),
+        'isBase64Encoded': sink.gzip_output
+    }
+
+
+class ExportSink:
+    '''File-like target for csv.writer and NDJSON lines that compresses as it goes'''
+
+    def __init__(self, gzip_output: bool):
+        self.gzip_output = gzip_output
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip_output else None
+        self._buffer = io.BytesIO() if gzip_output else io.StringIO()
+
+    def write(self, text: str) -> None:
+        if self._compressor:
+            self._buffer.write(self._compressor.compress(text.encode('utf-8')))
         else:
-            cursor.execute(
-                """SELECT o.*, u.email as user_email, u.full_name as user_name,
-                   json_agg(json_build_object(
+            self._buffer.write(text)
+
+    def getvalue(self) -> str:
+        if self._compressor:
+            self._buffer.write(self._compressor.flush())
+            return base64.b64encode(self._buffer.getvalue()).decode('ascii')
+        return self._buffer.getvalue()
+
+
+def get_sales_summary(query_params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Dashboard totals read from the sales_daily_* rollups plus the deltas that triggers
+    append on order insert and status change and that have not been folded in yet, so
+    the cost grows with days and products, not orders. Revenue excludes cancelled
+    orders; by_status reports every status.
+    '''
+    try:
+        date_to = date.fromisoformat(query_params['date_to']) if query_params.get('date_to') else date.today()
+        date_from = (
+            date.fromisoformat(query_params['date_from']) if query_params.get('date_from')
+            else date_to - timedelta(days=SALES_SUMMARY_DEFAULT_DAYS - 1)
+        )
+    except ValueError:
+        raise HttpError(400, 'Invalid date range')
+    
+    with db_cursor() as cursor:
+        maybe_fold_sales_deltas(cursor)
+        cursor.execute(
+            """WITH days AS (
+                   SELECT day, status, orders_count, revenue FROM sales_daily_orders WHERE day BETWEEN %(from)s AND %(to)s
+                   UNION ALL
+                   SELECT day, status, orders_count, revenue FROM sales_daily_orders_deltas WHERE day BETWEEN %(from)s AND %(to)s
+               ), products_sold AS (
+                   SELECT s.product_id, p.name, p.category, sum(s.quantity) as quantity, sum(s.revenue) as revenue
+                   FROM (
+                       SELECT day, product_id, status, quantity, revenue FROM sales_daily_products
+                       UNION ALL
+                       SELECT day, product_id, status, quantity, revenue FROM sales_daily_products_deltas
+                   ) s
+                   JOIN products p ON p.id = s.product_id
+                   WHERE s.day BETWEEN %(from)s AND %(to)s AND s.status <> 'cancelled'
+                   GROUP BY s.product_id, p.name, p.category
+               )
+               SELECT
+                   (SELECT COALESCE(json_agg(d ORDER BY d.day), '[]'::json) FROM (
+                       SELECT day, sum(orders_count) as orders, sum(revenue) as revenue
+                       FROM days WHERE status <> 'cancelled' GROUP BY day
+                   ) d) as by_day,
+                   (SELECT COALESCE(json_agg(st ORDER BY st.status), '[]'::json) FROM (
+                       SELECT status, sum(orders_count) as orders, sum(revenue) as revenue
+                       FROM days GROUP BY status
+                   ) st) as by_status,
+                   (SELECT COALESCE(json_agg(c ORDER BY c.revenue DESC), '[]'::json) FROM (
+                       SELECT category, sum(quantity) as quantity, sum(revenue) as revenue
+                       FROM products_sold GROUP BY category
+                   ) c) as by_category,
+                   (SELECT COALESCE(json_agg(ps ORDER BY ps.revenue DESC), '[]'::json) FROM (
+                       SELECT * FROM products_sold ORDER BY revenue DESC LIMIT %(top)s
+                   ) ps) as by_product""",
+            {'from': date_from, 'to': date_to, 'top': SALES_SUMMARY_TOP_PRODUCTS}
+        )
+        summary = cursor.fetchone()
+    
+    return build_response(200, {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        **summary
+    })
+
+
+def maybe_fold_sales_deltas(cursor: Any) -> None:
+    '''
+    Fold the appended sales deltas into the rollups at most once per
+    SALES_FOLD_INTERVAL_SECONDS per container. Only folders touch the rollup rows now,
+    so checkouts never wait on them; a fold already running elsewhere is skipped.
+    '''
+    global _sales_folded_at
+    now = time.monotonic()
+    if now - _sales_folded_at < SALES_FOLD_INTERVAL_SECONDS:
+        return
+    _sales_folded_at = now
+    with span('fold_sales_deltas'):
+        cursor.execute("SELECT fold_sales_deltas()")
+        cursor.connection.commit()
+
+
+def get_order_feed(query_params: Dict[str, str]) -> Dict[str, Any]:
+    '''
+    Long-poll for orders created or re-statused after the cursor. The cursor is the
+    (change_xid, id) of the last order returned and only ever moves up to the oldest
+    transaction still running, so an order committed late by a long transaction is
+    still delivered. Without a cursor that horizon is returned, so a client that asks
+    for it before loading its first page misses nothing in between. When nothing
+    changed, the connection LISTENs on orders_changed (fired by a trigger on commit)
+    for up to `wait` seconds before looking again, so an idle admin dashboard costs
+    one cheap index probe per wait period instead of a full reload.
+    '''
+    try:
+        since = decode_feed_cursor(query_params['since']) if query_params.get('since') else None
+        wait = min(max(float(query_params.get('wait', FEED_WAIT_SECONDS)), 0.0), FEED_MAX_WAIT_SECONDS)
+    except ValueError:
+        raise HttpError(400, 'Invalid filter or cursor')
+    
+    with db_cursor() as cursor:
+        if since is None:
+            cursor.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text as horizon")
+            return build_response(200, {'orders': [], 'cursor': encode_feed_cursor(int(cursor.fetchone()['horizon']), 0)})
+        
+        conn = cursor.connection
+        conn.commit()
+        conn.autocommit = True
+        try:
+            cursor.execute(f"LISTEN {ORDERS_CHANNEL}")
+            changes, horizon, pending = fetch_order_changes(cursor, since)
+            deadline = time.monotonic() + wait
+            notified = bool(conn.notifies)
+            while not changes and time.monotonic() < deadline:
+                # A commit that is still behind an older running transaction shows up
+                # once that one finishes, which sends no notification of its own
+                timeout = FEED_RECHECK_SECONDS if notified or pending else deadline - time.monotonic()
+                with span('listen'):
+                    if select.select([conn], [], [], max(min(timeout, deadline - time.monotonic()), 0.0))[0]:
+                        conn.poll()
+                notified = notified or bool(conn.notifies)
+                del conn.notifies[:]
+                if notified or pending:
+                    changes, horizon, pending = fetch_order_changes(cursor, since)
+        finally:
+            if not conn.closed:
+                cursor.execute(f"UNLISTEN {ORDERS_CHANNEL}")
+                del conn.notifies[:]
+                conn.autocommit = False
+    
+    if len(changes) == FEED_MAX_ORDERS:
+        next_cursor = encode_feed_cursor(int(changes[-1]['change_xid']), changes[-1]['id'])
+    else:
+        next_cursor = encode_feed_cursor(*max(since, (horizon, 0)))
+    with span('serialize'):
+        documents = ','.join(order['doc'] for order in changes)
+    return encoded_response(200, f'{{"orders":[{documents}],"cursor":{json.dumps(next_cursor)}}}')
+
+
+def fetch_order_changes(cursor: Any, since: Tuple[int, int]) -> Tuple[List[Any], int, bool]:
+    '''
+    Orders changed after the cursor by transactions older than every transaction still
+    running, together with that horizon and whether committed changes already wait at
+    or past it. Those may still be joined by an earlier commit, so they are held back
+    until the horizon passes them.
+    '''
+    cursor.execute(
+        """WITH h AS (SELECT pg_snapshot_xmin(pg_current_snapshot()) as horizon), p AS (
+               SELECT EXISTS (
+                   SELECT 1 FROM orders o, h
+                   WHERE (o.change_xid, o.id) > (%s::text::xid8, %s) AND o.change_xid >= h.horizon
+               ) as pending
+           )
+           SELECT h.horizon::text as horizon, p.pending, r.change_xid::text as change_xid, r.id, row_to_json(r)::text as doc
+           FROM h CROSS JOIN p LEFT JOIN LATERAL (
+               SELECT o.*, u.email as user_email, u.full_name as user_name, COALESCE(i.items, '[]'::json) as items
+               FROM (
+                   SELECT * FROM orders o
+                   WHERE (o.change_xid, o.id) > (%s::text::xid8, %s) AND o.change_xid < h.horizon
+                   ORDER BY o.change_xid, o.id
+                   LIMIT %s
+               ) o
+               LEFT JOIN users u ON o.user_id = u.id
+               LEFT JOIN LATERAL (
+                   SELECT json_agg(json_build_object(
                        'id', oi.id,
                        'product_name', oi.product_name,
                        'product_price', oi.product_price,
                        'quantity', oi.quantity,
                        'selected_size', oi.selected_size
-                   )) as items
-                   FROM orders o
-                   LEFT JOIN users u ON o.user_id = u.id
-                   LEFT JOIN order_items oi ON o.id = oi.order_id
-                   GROUP BY o.id, u.email, u.full_name
-                   ORDER BY o.created_at DESC"""
-            )
-        
-        orders = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps([dict(order) for order in orders], default=str),
-            'isBase64Encoded': False
-        }
-    
-    if method == 'PUT':
-        body = json.loads(event.get('body', '{}'))
-        order_id = body.get('order_id')
-        status = body.get('status')
-        
-        if not order_id or not status:
-            cursor.close()
-            conn.close()
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'order_id and status required'}),
-                'isBase64Encoded': False
-            }
-        
+                   ) ORDER BY oi.id) as items
+                   FROM order_items oi
+                   WHERE oi.order_id = o.id
+               ) i ON TRUE
+           ) r ON TRUE
+           ORDER BY r.change_xid, r.id""",
+        (str(since[0]), since[1], str(since[0]), since[1], FEED_MAX_ORDERS)
+    )
+    rows = cursor.fetchall()
+    return [row for row in rows if row['id'] is not None], int(rows[0]['horizon']), rows[0]['pending']
+
+
+def update_order_status(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    order_id = body.get('order_id')
+    order_ids = body.get('order_ids')
+    status = body.get('status')
+    
+    if not (order_id or order_ids) or not status:
+        raise HttpError(400, 'order_id or order_ids and status required')
+    if status not in ORDER_STATUS_LABELS:
+        raise HttpError(400, 'Unknown status')
+    
+    try:
+        if order_ids and not isinstance(order_ids, list):
+            raise TypeError
+        ids = [int(i) for i in order_ids] if order_ids else [int(order_id)]
+    except (TypeError, ValueError):
+        raise HttpError(400, 'order_id must be an integer and order_ids a list of integers')
+    notification = f"📦 Заказ #%s\n\nНовый статус: {ORDER_STATUS_LABELS[status]}"
+    
+    with db_cursor() as cursor:
         cursor.execute(
-            "UPDATE orders SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING id, status",
-            (status, order_id)
+            """WITH previous AS (
+                   SELECT id, status FROM orders WHERE id = ANY(%s) FOR UPDATE
+               ), updated AS (
+                   UPDATE orders o SET status = %s, updated_at = CURRENT_TIMESTAMP
+                   FROM previous
+                   WHERE o.id = previous.id
+                   RETURNING o.id, o.status, o.user_id, previous.status as previous_status
+               ), notifications AS (
+                   INSERT INTO telegram_outbox (chat_id, order_id, text, kind)
+                   SELECT u.telegram_id, updated.id, format(%s, updated.id), 'status_change'
+                   FROM updated
+                   JOIN users u ON u.id = updated.user_id
+                   WHERE u.telegram_id IS NOT NULL AND updated.previous_status IS DISTINCT FROM updated.status
+               )
+               SELECT id, status FROM updated ORDER BY id""",
+            (ids, status, notification)
         )
-        order = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        if order:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'order': dict(order)}),
-                'isBase64Encoded': False
-            }
-        else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Order not found'}),
-                'isBase64Encoded': False
-            }
+        orders = cursor.fetchall()
+        cursor.connection.commit()
     
-    cursor.close()
-    conn.close()
+    if order_ids:
+        updated_ids = {order['id'] for order in orders}
+        return build_response(200, {
+            'success': True,
+            'orders': [dict(order) for order in orders],
+            'not_found': [i for i in ids if i not in updated_ids]
+        })
     
+    if not orders:
+        raise HttpError(404, 'Order not found')
+    return build_response(200, {'success': True, 'order': dict(orders[0])})
+
+
+ROUTES: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    'POST': create_order,
+    'GET': get_orders,
+    'PUT': update_order_status
+}
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body') or '{}')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return body
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=json_default)
+    return encoded_response(status_code, payload, headers)
+
+
+def encoded_response(status_code: int, body: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    '''Wrap an already serialized JSON document, e.g. one rendered by Postgres with row_to_json'''
     return {
-        'statusCode': 404,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Not found'}),
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': body,
         'isBase64Encoded': False
     }
+
+
+def json_default(value: Any) -> Any:
+    '''Render Decimal as a number and dates in ISO format, matching what Postgres JSON produces'''
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
+        
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
+        
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor(name: Optional[str] = None) -> Iterator[Any]:
+    '''
+    Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release.
+    A name makes it a server-side cursor that fetches rows in batches of cursor.itersize.
+    '''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(name=name, cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{order_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(value: str) -> Tuple[datetime, int]:
+    created_at, order_id = base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8').split('|')
+    return datetime.fromisoformat(created_at), int(order_id)
+
+
+def encode_feed_cursor(change_xid: int, order_id: int) -> str:
+    raw = f"{change_xid}|{order_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_feed_cursor(value: str) -> Tuple[int, int]:
+    change_xid, order_id = base64.urlsafe_b64decode(value.encode('ascii')).decode('utf-8').split('|')
+    if int(change_xid) < 0:
+        raise ValueError('transaction ids are never negative')
+    return int(change_xid), int(order_id)
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
+    return {
+        'db_pool': db_pool_stats()
+    }
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
@@ -0,0 +1,450 @@
+'''
+Business: Product catalog - list, detail, categories and ranked search with cached, ETag-validated responses
+Args: event with httpMethod (GET), query params path (/list, /detail, /categories, /search), category, id, q, limit, offset; If-None-Match header
+Returns: HTTP response with catalog JSON or 304 Not Modified
+'''
+
+import hashlib
+import importlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get('CATALOG_CACHE_TTL_SECONDS', '30'))
+CATALOG_CACHE_MAX_SIZE = int(os.environ.get('CATALOG_CACHE_MAX_SIZE', '1000'))
+CATALOG_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=300'
+
+_catalog_cache: Dict[str, Dict[str, Any]] = {}
+_catalog_cache_lock = threading.Lock()
+_catalog_cache_stats: Dict[str, int] = {'hits': 0, 'revalidations': 0, 'reloads': 0, 'not_modified': 0}
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'products'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, If-None-Match',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+ROUTE_PATTERN = re.compile(r'/(list|detail|categories|search)(?![\w-])')
+
+PRODUCT_COLUMNS = 'id, name, description, price::float8 as price, category, image_url, sizes, stock'
+PRODUCT_COLUMNS_QUALIFIED = ', '.join('p.' + column.strip() for column in PRODUCT_COLUMNS.split(','))
+
+SEARCH_PAGE_SIZE = 24
+SEARCH_PAGE_MAX_SIZE = 100
+SEARCH_QUERY_MAX_LENGTH = 100
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
+    
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
+    
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
+    method: str = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return PREFLIGHT_RESPONSE
+    
+    route = ROUTES.get((method, resolve_path(event)))
+    if route is None:
+        return build_response(404, {'error': 'Not found'})
+    
+    try:
+        return route(event)
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message}, e.headers)
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def list_products(event: Dict[str, Any]) -> Dict[str, Any]:
+    category = (event.get('queryStringParameters', {}) or {}).get('category')
+    
+    def load(cursor: Any) -> Dict[str, Any]:
+        if category:
+            cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE listed AND category = %s ORDER BY id", (category,))
+        else:
+            cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE listed ORDER BY id")
+        return {'products': [dict(row) for row in cursor.fetchall()]}
+    
+    return cached_response(event, f"list:{category or ''}", load)
+
+
+def get_product(event: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        product_id = int((event.get('queryStringParameters', {}) or {}).get('id', ''))
+    except ValueError:
+        raise HttpError(400, 'Product id required')
+    
+    def load(cursor: Any) -> Optional[Dict[str, Any]]:
+        cursor.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id = %s AND listed", (product_id,))
+        product = cursor.fetchone()
+        return {'product': dict(product)} if product else None
+    
+    return cached_response(event, f"detail:{product_id}", load)
+
+
+def list_categories(event: Dict[str, Any]) -> Dict[str, Any]:
+    def load(cursor: Any) -> Dict[str, Any]:
+        cursor.execute(
+            """SELECT category, count(*) as product_count
+               FROM products
+               WHERE listed AND category IS NOT NULL
+               GROUP BY category
+               ORDER BY category"""
+        )
+        return {'categories': [dict(row) for row in cursor.fetchall()]}
+    
+    return cached_response(event, 'categories', load)
+
+
+def search_products(event: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Ranked search over name, category and description. Full-text matches use the
+    search_vector GIN index; names that only resemble the query (typos) are matched
+    with trigram word similarity. Facets count matches per category before the
+    category filter is applied, so the client can offer the other categories.
+    '''
+    query_params = event.get('queryStringParameters', {}) or {}
+    query = ' '.join((query_params.get('q') or '').split())[:SEARCH_QUERY_MAX_LENGTH]
+    category = query_params.get('category') or None
+    if not query:
+        raise HttpError(400, 'Search query required')
+    try:
+        limit = min(max(int(query_params.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_PAGE_MAX_SIZE)
+        offset = max(int(query_params.get('offset', 0)), 0)
+    except ValueError:
+        raise HttpError(400, 'Invalid limit or offset')
+    
+    def load(cursor: Any) -> Dict[str, Any]:
+        cursor.execute(
+            f"""WITH matches AS (
+                   SELECT p.id, p.category,
+                          ts_rank_cd(p.search_vector, q.query) + word_similarity(%(q)s, p.name) as rank
+                   FROM products p, websearch_to_tsquery('russian', %(q)s) q(query)
+                   WHERE p.listed AND (p.search_vector @@ q.query OR %(q)s <%% p.name)
+               ), filtered AS (
+                   SELECT * FROM matches WHERE %(category)s::text IS NULL OR category = %(category)s
+               )
+               SELECT
+                   (SELECT count(*) FROM filtered) as total,
+                   (SELECT COALESCE(json_agg(f ORDER BY f.product_count DESC, f.category), '[]'::json) FROM (
+                       SELECT category, count(*) as product_count FROM matches
+                       WHERE category IS NOT NULL GROUP BY category
+                   ) f) as facets,
+                   (SELECT COALESCE(json_agg(row_to_json(r) ORDER BY r.rank DESC, r.id), '[]'::json) FROM (
+                       SELECT {PRODUCT_COLUMNS_QUALIFIED}, filtered.rank
+                       FROM filtered JOIN products p ON p.id = filtered.id
+                       ORDER BY filtered.rank DESC, p.id
+                       LIMIT %(limit)s OFFSET %(offset)s
+                   ) r) as products""",
+            {'q': query, 'category': category, 'limit': limit, 'offset': offset}
+        )
+        result = dict(cursor.fetchone())
+        result['next_offset'] = offset + limit if offset + limit < result['total'] else None
+        return result
+    
+    return cached_response(event, f"search:{query.lower()}|{category or ''}|{limit}|{offset}", load)
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    ('GET', ''): list_products,
+    ('GET', '/list'): list_products,
+    ('GET', '/detail'): get_product,
+    ('GET', '/categories'): list_categories,
+    ('GET', '/search'): search_products
+}
+
+
+def cached_response(event: Dict[str, Any], key: str, load: Callable[[Any], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    '''
+    Serve a catalog payload from the in-process cache. Expired entries are
+    revalidated against the catalog version and reloaded only when it changed;
+    a matching If-None-Match answers 304 without a body.
+    '''
+    now = time.monotonic()
+    with _catalog_cache_lock:
+        entry = _catalog_cache.get(key)
+    
+    if entry is not None and entry['expires_at'] > now:
+        _catalog_cache_stats['hits'] += 1
+    else:
+        with db_cursor() as cursor:
+            version = catalog_version(cursor)
+            if entry is not None and entry['version'] == version:
+                entry = {**entry, 'expires_at': now + CATALOG_CACHE_TTL_SECONDS}
+                _catalog_cache_stats['revalidations'] += 1
+            else:
+                payload = load(cursor)
+                if payload is None:
+                    raise HttpError(404, 'Product not found')
+                with span('serialize'):
+                    body = json.dumps(payload, default=str)
+                entry = {
+                    'version': version,
+                    'body': body,
+                    'etag': '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"',
+                    'expires_at': now + CATALOG_CACHE_TTL_SECONDS
+                }
+                _catalog_cache_stats['reloads'] += 1
+        with _catalog_cache_lock:
+            _catalog_cache.pop(key, None)
+            if len(_catalog_cache) >= CATALOG_CACHE_MAX_SIZE:
+                del _catalog_cache[next(iter(_catalog_cache))]
+            _catalog_cache[key] = entry
+    
+    headers = {**JSON_HEADERS, 'ETag': entry['etag'], 'Cache-Control': CATALOG_CACHE_CONTROL, 'Access-Control-Expose-Headers': 'ETag'}
+    request_headers = event.get('headers', {}) or {}
+    if_none_match = request_headers.get('If-None-Match') or request_headers.get('if-none-match') or ''
+    if entry['etag'] in [tag.strip() for tag in if_none_match.split(',')]:
+        _catalog_cache_stats['not_modified'] += 1
+        return {'statusCode': 304, 'headers': headers, 'body': '', 'isBase64Encoded': False}
+    
+    return {'statusCode': 200, 'headers': headers, 'body': entry['body'], 'isBase64Encoded': False}
+
+
+def catalog_version(cursor: Any) -> Tuple[Any, ...]:
+    '''
+    Sum of the catalog version counters, which every committed insert, edit or
+    removal of products raises; reading sixteen rows costs the same at any catalog size
+    '''
+    cursor.execute("SELECT sum(version) as version FROM catalog_versions")
+    return (cursor.fetchone()['version'],)
+
+
+def catalog_cache_stats() -> Dict[str, int]:
+    with _catalog_cache_lock:
+        return {**_catalog_cache_stats, 'entries': len(_catalog_cache)}
+
+
+def resolve_path(event: Dict[str, Any]) -> str:
+    raw_path = event.get('requestContext', {}).get('http', {}).get('path', '')
+    if not raw_path:
+        raw_path = (event.get('queryStringParameters', {}) or {}).get('path', '')
+    match = ROUTE_PATTERN.search(raw_path)
+    return match.group(0) if match else ''
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=str)
+    return {
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': payload,
+        'isBase64Encoded': False
+    }
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
+        
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
+        
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor() -> Iterator[Any]:
+    '''Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release'''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
+    return {
+        'db_pool': db_pool_stats(),
+        'catalog_cache': catalog_cache_stats()
+    }
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
@@ -1,149 +1,538 @@
 '''
 Business: Telegram bot for user authentication and account linking with MAISON shop
-Args: event with Telegram webhook updates
-Returns: HTTP response with bot actions
+Args: event with Telegram webhook updates; run as a script to long-poll getUpdates instead
+Returns: HTTP response carrying the reply as a sendMessage call
 '''
 
+import importlib
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'telegram-bot'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT_SECONDS = (3.05, 10)
+TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', '10'))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', '2'))
+TELEGRAM_MAX_RETRY_WAIT_SECONDS = float(os.environ.get('TELEGRAM_MAX_RETRY_WAIT_SECONDS', '5'))
+
+_telegram_session: Any = None
+_telegram_session_lock = threading.Lock()
+_telegram_stats: Dict[str, float] = {'calls': 0, 'retries': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+TELEGRAM_POLL_LIMIT = 100
+TELEGRAM_POLL_TIMEOUT_SECONDS = 25
+TELEGRAM_SEEN_UPDATES_MAX = 1000
+TELEGRAM_UPDATES_TTL_SECONDS = 24 * 3600
+TELEGRAM_UPDATES_PURGE_INTERVAL_SECONDS = 600
+
+_seen_updates: Dict[int, None] = {}
+_updates_purged_at = 0.0
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
 
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-except ImportError:
-    psycopg2 = None
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
+    
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
+    
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'POST')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    database_url = os.environ.get('DATABASE_URL')
+        return PREFLIGHT_RESPONSE
     
-    if not bot_token:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Bot token not configured'}),
-            'isBase64Encoded': False
-        }
+    if method != 'POST':
+        return build_response(404, {'error': 'Not found'})
     
-    if method == 'POST':
-        try:
-            update = json.loads(event.get('body', '{}'))
-            
-            if 'message' not in update:
-                return {
-                    'statusCode': 200,
-                    'headers': {'Content-Type': 'application/json'},
-                    'body': json.dumps({'ok': True}),
-                    'isBase64Encoded': False
-                }
-            
-            message = update['message']
-            chat_id = message['chat']['id']
-            telegram_id = message['from']['id']
-            telegram_username = message['from'].get('username', '')
-            text = message.get('text', '')
-            
-            if text == '/start':
-                send_telegram_message(
-                    bot_token,
-                    chat_id,
-                    f"👋 Добро пожаловать в MAISON!\n\n"
-                    f"Ваш Telegram ID: `{telegram_id}`\n"
-                    f"Username: @{telegram_username}\n\n"
-                    f"Используйте кнопку 'Привязать Telegram' на сайте для связи аккаунтов.\n\n"
-                    f"После привязки вы будете получать уведомления о ваших заказах здесь."
-                )
-            
-            elif text == '/link':
-                if not database_url:
-                    send_telegram_message(bot_token, chat_id, "❌ Ошибка: база данных не настроена")
-                    return build_response(200, {'ok': True})
-                
-                conn = psycopg2.connect(database_url)
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                
-                cursor.execute(
-                    "SELECT id, email, full_name FROM users WHERE telegram_id = %s",
-                    (telegram_id,)
-                )
-                user = cursor.fetchone()
-                cursor.close()
-                conn.close()
-                
-                if user:
-                    send_telegram_message(
-                        bot_token,
-                        chat_id,
-                        f"✅ Ваш аккаунт уже привязан!\n\n"
-                        f"Email: {user['email']}\n"
-                        f"Имя: {user['full_name'] or 'Не указано'}\n\n"
-                        f"Вы будете получать уведомления о заказах."
-                    )
-                else:
-                    send_telegram_message(
-                        bot_token,
-                        chat_id,
-                        f"📱 Привязка аккаунта\n\n"
-                        f"Ваш Telegram ID: `{telegram_id}`\n\n"
-                        f"Войдите на сайт MAISON и нажмите кнопку 'Привязать Telegram' в личном кабинете."
-                    )
-            
-            elif text == '/help':
-                send_telegram_message(
-                    bot_token,
-                    chat_id,
-                    "📖 Доступные команды:\n\n"
-                    "/start - Начало работы с ботом\n"
-                    "/link - Привязка аккаунта\n"
-                    "/help - Справка по командам\n\n"
-                    "После привязки аккаунта вы будете получать уведомления о статусе ваших заказов."
-                )
-            
-            else:
-                send_telegram_message(
-                    bot_token,
-                    chat_id,
-                    "❓ Неизвестная команда. Используйте /help для списка доступных команд."
-                )
-            
+    try:
+        update = parse_body(event)
+        update_id = update.get('update_id')
+        if update_id is not None and not claim_updates([update_id]):
             return build_response(200, {'ok': True})
-            
-        except Exception as e:
-            return build_response(500, {'error': str(e)})
+        try:
+            reply = handle_update(update)
+        except Exception:
+            # The 500 makes Telegram redeliver; the claim must not turn that into a duplicate
+            if update_id is not None:
+                release_update_claims([update_id])
+            raise
+        return build_response(200, reply or {'ok': True})
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message}, e.headers)
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON body'})
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def handle_update(update: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    '''
+    Run the command and return the reply as a Bot API method call. The webhook hands it
+    back as the response body, so Telegram delivers it without a separate sendMessage.
+    '''
+    if 'message' not in update:
+        return None
+    
+    message = update['message']
+    command = COMMANDS.get(message.get('text', ''), unknown_command)
+    return {
+        'method': 'sendMessage',
+        'chat_id': message['chat']['id'],
+        'text': command(message),
+        'parse_mode': 'Markdown'
+    }
+
+
+def claim_updates(update_ids: List[int]) -> List[int]:
+    '''
+    Return the update ids nobody has handled yet. Telegram redelivers updates when the
+    webhook answers slowly, possibly to another container, so ids are checked against a
+    bounded per-container set first and then claimed in telegram_updates in one statement.
+    '''
+    fresh = [update_id for update_id in update_ids if update_id not in _seen_updates]
+    if fresh and os.environ.get('DATABASE_URL'):
+        with db_cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO telegram_updates (update_id)
+                   SELECT unnest(%s::bigint[])
+                   ON CONFLICT (update_id) DO NOTHING
+                   RETURNING update_id""",
+                (fresh,)
+            )
+            claimed = {row['update_id'] for row in cursor.fetchall()}
+            maybe_purge_updates(cursor)
+            cursor.connection.commit()
+        fresh = [update_id for update_id in fresh if update_id in claimed]
+    
+    for update_id in update_ids:
+        _seen_updates[update_id] = None
+    while len(_seen_updates) > TELEGRAM_SEEN_UPDATES_MAX:
+        del _seen_updates[next(iter(_seen_updates))]
+    return fresh
+
+
+def release_update_claims(update_ids: List[int]) -> None:
+    '''Forget claims whose command failed, so the redelivered update runs again'''
+    for update_id in update_ids:
+        _seen_updates.pop(update_id, None)
+    if os.environ.get('DATABASE_URL'):
+        with db_cursor() as cursor:
+            cursor.execute("DELETE FROM telegram_updates WHERE update_id = ANY(%s)", (update_ids,))
+            cursor.connection.commit()
+
+
+def maybe_purge_updates(cursor: Any) -> None:
+    '''Drop claimed update ids older than Telegram's redelivery window, at most once per interval per container'''
+    global _updates_purged_at
+    now = time.monotonic()
+    if now - _updates_purged_at < TELEGRAM_UPDATES_PURGE_INTERVAL_SECONDS:
+        return
+    _updates_purged_at = now
+    cursor.execute(
+        "DELETE FROM telegram_updates WHERE received_at < CURRENT_TIMESTAMP - %s * INTERVAL '1 second'",
+        (TELEGRAM_UPDATES_TTL_SECONDS,)
+    )
+
+
+def poll_updates(bot_token: str) -> None:
+    '''
+    Long-polling alternative to the webhook for local runs or when webhook delivery backs
+    up (the webhook must be removed first). Each getUpdates batch is deduplicated in one
+    statement and replies go out over the shared session.
+    '''
+    offset = 0
+    while True:
+        response = telegram_api_call(
+            bot_token,
+            'getUpdates',
+            {'offset': offset, 'limit': TELEGRAM_POLL_LIMIT, 'timeout': TELEGRAM_POLL_TIMEOUT_SECONDS},
+            timeout=(TELEGRAM_TIMEOUT_SECONDS[0], TELEGRAM_POLL_TIMEOUT_SECONDS + TELEGRAM_TIMEOUT_SECONDS[1])
+        )
+        response.raise_for_status()
+        updates = response.json().get('result', [])
+        if not updates:
+            continue
+        offset = updates[-1]['update_id'] + 1
+        
+        fresh = set(claim_updates([update['update_id'] for update in updates]))
+        for update in updates:
+            if update['update_id'] not in fresh:
+                continue
+            try:
+                reply = handle_update(update)
+                if reply:
+                    send_telegram_message(bot_token, reply['chat_id'], reply['text'])
+            except Exception:
+                traceback.print_exc()
+
+
+def start_command(message: Dict[str, Any]) -> str:
+    telegram_id = message['from']['id']
+    telegram_username = message['from'].get('username', '')
+    return (
+        f"👋 Добро пожаловать в MAISON!\n\n"
+        f"Ваш Telegram ID: `{telegram_id}`\n"
+        f"Username: @{telegram_username}\n\n"
+        f"Используйте кнопку 'Привязать Telegram' на сайте для связи аккаунтов.\n\n"
+        f"После привязки вы будете получать уведомления о ваших заказах здесь."
+    )
+
+
+def link_command(message: Dict[str, Any]) -> str:
+    telegram_id = message['from']['id']
+    
+    if not os.environ.get('DATABASE_URL'):
+        return "❌ Ошибка: база данных не настроена"
+    
+    with db_cursor() as cursor:
+        cursor.execute(
+            "SELECT id, email, full_name FROM users WHERE telegram_id = %s",
+            (telegram_id,)
+        )
+        user = cursor.fetchone()
     
-    return build_response(404, {'error': 'Not found'})
+    if user:
+        return (
+            f"✅ Ваш аккаунт уже привязан!\n\n"
+            f"Email: {user['email']}\n"
+            f"Имя: {user['full_name'] or 'Не указано'}\n\n"
+            f"Вы будете получать уведомления о заказах."
+        )
+    return (
+        f"📱 Привязка аккаунта\n\n"
+        f"Ваш Telegram ID: `{telegram_id}`\n\n"
+        f"Войдите на сайт MAISON и нажмите кнопку 'Привязать Telegram' в личном кабинете."
+    )
+
+
+def help_command(message: Dict[str, Any]) -> str:
+    return (
+        "📖 Доступные команды:\n\n"
+        "/start - Начало работы с ботом\n"
+        "/link - Привязка аккаунта\n"
+        "/help - Справка по командам\n\n"
+        "После привязки аккаунта вы будете получать уведомления о статусе ваших заказов."
+    )
+
+
+def unknown_command(message: Dict[str, Any]) -> str:
+    return "❓ Неизвестная команда. Используйте /help для списка доступных команд."
+
+
+COMMANDS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    '/start': start_command,
+    '/link': link_command,
+    '/help': help_command
+}
 
 
 def send_telegram_message(bot_token: str, chat_id: int, text: str):
-    import requests
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    requests.post(url, json={
+    telegram_api_call(bot_token, 'sendMessage', {
         'chat_id': chat_id,
         'text': text,
         'parse_mode': 'Markdown'
     })
 
 
-def build_response(status_code: int, body: dict) -> Dict[str, Any]:
+def telegram_api_call(
+    bot_token: str,
+    api_method: str,
+    payload: Dict[str, Any],
+    timeout: Tuple[float, float] = TELEGRAM_TIMEOUT_SECONDS
+) -> Any:
+    '''POST to the Bot API over the shared keep-alive session, retrying 429s that ask for a short wait'''
+    requests = lazy_import('requests')
+    session = telegram_session()
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/{api_method}"
+    attempt = 0
+    while True:
+        started_at = time.perf_counter()
+        try:
+            with span('telegram', api_method):
+                response = session.post(url, json=payload, timeout=timeout)
+        except requests.RequestException:
+            _telegram_stats['errors'] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            _telegram_stats['calls'] += 1
+            _telegram_stats['total_ms'] += elapsed_ms
+            _telegram_stats['max_ms'] = max(_telegram_stats['max_ms'], elapsed_ms)
+        
+        if response.status_code != 429 or attempt >= TELEGRAM_MAX_RETRIES:
+            return response
+        retry_after = telegram_retry_after(response)
+        if retry_after > TELEGRAM_MAX_RETRY_WAIT_SECONDS:
+            return response
+        _telegram_stats['retries'] += 1
+        attempt += 1
+        time.sleep(retry_after)
+
+
+def telegram_session() -> Any:
+    '''Keep-alive Bot API session, created on the first call so the webhook cold start skips requests'''
+    global _telegram_session
+    if _telegram_session is not None:
+        return _telegram_session
+    with _telegram_session_lock:
+        if _telegram_session is None:
+            requests = lazy_import('requests')
+            adapter_options = {'pool_connections': 1, 'pool_maxsize': TELEGRAM_POOL_SIZE}
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(**adapter_options))
+            session.mount('http://', requests.adapters.HTTPAdapter(**adapter_options))
+            _telegram_session = session
+    return _telegram_session
+
+
+def telegram_retry_after(response: Any, default: float = 1.0) -> float:
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        return default
+
+
+def telegram_stats() -> Dict[str, float]:
+    calls = _telegram_stats['calls']
+    return {**_telegram_stats, 'avg_ms': _telegram_stats['total_ms'] / calls if calls else 0.0}
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body') or '{}')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return body
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=str)
     return {
         'statusCode': status_code,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps(body),
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': payload,
         'isBase64Encoded': False
     }
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
+        
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
+        
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor() -> Iterator[Any]:
+    '''Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release'''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
+    return {
+        'db_pool': db_pool_stats(),
+        'telegram': telegram_stats()
+    }
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
+
+
+if __name__ == '__main__':
+    poll_updates(os.environ['TELEGRAM_BOT_TOKEN'])
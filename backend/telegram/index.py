@@ -1,80 +1,303 @@
 '''
-Business: Send Telegram notifications about new orders and link Telegram accounts
-Args: event with httpMethod, body with order details or telegram linking data
+Business: Queue and deliver Telegram notifications about orders and link Telegram accounts
+Args: event with httpMethod, body with order details or telegram linking data; /drain-outbox sends queued messages (run by the storefront after each enqueue and by a scheduler or `python index.py` for retries)
 Returns: HTTP response with success status
 '''
 
+import importlib
 import json
 import os
-import requests
-from typing import Dict, Any
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+_init_started_at = time.perf_counter()
+
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+DB_POOL_MAX_IDLE_SECONDS = float(os.environ.get('DB_POOL_MAX_IDLE_SECONDS', '300'))
+DB_POOL_PING_AFTER_SECONDS = float(os.environ.get('DB_POOL_PING_AFTER_SECONDS', '30'))
+
+_db_pool: List[Tuple[Any, float]] = []
+_db_pool_lock = threading.Lock()
+_db_pool_stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'reconnects': 0, 'evictions': 0}
+
+TRACE_ENABLED = os.environ.get('TRACE_ENABLED') == '1'
+TRACE_FUNCTION_NAME = 'telegram'
+TRACE_SQL_MAX_LENGTH = 200
+
+_trace_spans: Optional[List[Tuple[str, float, Optional[str]]]] = None
+_cold_start = True
+
+_lazy_modules: Dict[str, Any] = {}
+_cursor_factory: Any = None
+
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+PREFLIGHT_RESPONSE = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': '',
+    'isBase64Encoded': False
+}
+ROUTE_PATTERN = re.compile(r'/(notify-order|link-account|drain-outbox)(?![\w-])')
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT_SECONDS = (3.05, 10)
+TELEGRAM_POOL_SIZE = int(os.environ.get('TELEGRAM_POOL_SIZE', '10'))
+TELEGRAM_MAX_RETRIES = int(os.environ.get('TELEGRAM_MAX_RETRIES', '2'))
+TELEGRAM_MAX_RETRY_WAIT_SECONDS = float(os.environ.get('TELEGRAM_MAX_RETRY_WAIT_SECONDS', '5'))
+TELEGRAM_GLOBAL_RATE_PER_SECOND = 30
+TELEGRAM_CHAT_INTERVAL_SECONDS = 1.0
+TELEGRAM_SEND_CONCURRENCY = int(os.environ.get('TELEGRAM_SEND_CONCURRENCY', '8'))
+
+_telegram_session: Any = None
+_telegram_session_lock = threading.Lock()
+_telegram_stats: Dict[str, float] = {'calls': 0, 'retries': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_BACKOFF_BASE_SECONDS = 5.0
+OUTBOX_BACKOFF_MAX_SECONDS = 3600.0
+OUTBOX_DRAIN_BUDGET_SECONDS = float(os.environ.get('OUTBOX_DRAIN_BUDGET_SECONDS', '20'))
+OUTBOX_POLL_SECONDS = float(os.environ.get('OUTBOX_POLL_SECONDS', '5'))
+OUTBOX_LEASE_SECONDS = OUTBOX_DRAIN_BUDGET_SECONDS + 60
+
+_next_send_at = 0.0
+_chat_next_send_at: Dict[int, float] = {}
+_send_slot_lock = threading.Lock()
+
+
+class HttpError(Exception):
+    '''Raised by route handlers to answer with an error status and message'''
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+        self.headers = headers
 
-try:
-    import psycopg2
-    from psycopg2.extras import RealDictCursor
-except ImportError:
-    psycopg2 = None
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    global _cold_start
+    cold_start, _cold_start = _cold_start, False
+    if not TRACE_ENABLED:
+        return dispatch(event)
+    return traced_dispatch(event, cold_start)
+
+
+def traced_dispatch(event: Dict[str, Any], cold_start: bool) -> Dict[str, Any]:
+    '''Run dispatch while collecting spans, log them as one JSON line and report them in Server-Timing'''
+    global _trace_spans
+    _trace_spans = []
+    started_at = time.perf_counter()
+    try:
+        response = dispatch(event)
+    finally:
+        spans, _trace_spans = _trace_spans, None
+    total_ms = (time.perf_counter() - started_at) * 1000
+    
+    print(json.dumps({'trace': {
+        'function': TRACE_FUNCTION_NAME,
+        'method': event.get('httpMethod'),
+        'status': response['statusCode'],
+        'cold_start': cold_start,
+        'init_ms': INIT_MS if cold_start else None,
+        'total_ms': round(total_ms, 2),
+        'spans': [{'name': name, 'ms': round(ms, 2), 'detail': detail} for name, ms, detail in spans],
+        'stats': runtime_stats()
+    }}, ensure_ascii=False))
+    
+    totals: Dict[str, float] = {}
+    for name, ms, _ in spans:
+        totals[name] = totals.get(name, 0.0) + ms
+    metrics = [f'{name};dur={ms:.1f}' for name, ms in totals.items()] + [f'total;dur={total_ms:.1f}']
+    if cold_start:
+        metrics.append(f'init;desc="cold start";dur={INIT_MS:.1f}')
+    return {
+        **response,
+        'headers': {**response['headers'], 'Server-Timing': ', '.join(metrics), 'Timing-Allow-Origin': '*'}
+    }
+
+
+def dispatch(event: Dict[str, Any]) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return PREFLIGHT_RESPONSE
     
-    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-    database_url = os.environ.get('DATABASE_URL')
+    route = ROUTES.get((method, resolve_path(event)))
+    if route is None:
+        return build_response(404, {'error': 'Not found'})
+    
+    try:
+        return route(event)
+    except HttpError as e:
+        return build_response(e.status_code, {'error': e.message}, e.headers)
+    except json.JSONDecodeError:
+        return build_response(400, {'error': 'Invalid JSON body'})
+    except Exception:
+        traceback.print_exc()
+        return build_response(500, {'error': 'Internal server error'})
+
+
+def notify_order(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    order_id = body.get('order_id')
+    user_name = body.get('user_name', 'Гость')
+    total_amount = body.get('total_amount', 0)
+    items = body.get('items', [])
+    telegram_chat_id = body.get('telegram_chat_id')
+    
+    if not telegram_chat_id:
+        raise HttpError(400, 'Telegram chat ID required')
+    
+    with db_cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO telegram_outbox (chat_id, order_id, text) VALUES (%s, %s, %s) RETURNING id",
+            (telegram_chat_id, order_id, format_order_message(order_id, user_name, total_amount, items))
+        )
+        outbox_entry = cursor.fetchone()
+        cursor.connection.commit()
     
+    return build_response(202, {'success': True, 'message': 'Notification queued', 'outbox_id': outbox_entry['id']})
+
+
+def drain(event: Dict[str, Any]) -> Dict[str, Any]:
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
     if not bot_token:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Telegram bot not configured'}),
-            'isBase64Encoded': False
-        }
-    
-    query_params = event.get('queryStringParameters', {}) or {}
+        raise HttpError(500, 'Telegram bot not configured')
+    
+    with db_cursor() as cursor:
+        result = drain_outbox(cursor, bot_token)
+    
+    return build_response(200, {'success': True, **result})
+
+
+def link_account(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = parse_body(event)
+    user_id = body.get('user_id')
+    telegram_id = body.get('telegram_id')
+    telegram_username = body.get('telegram_username')
+    
+    if not user_id or not telegram_id:
+        raise HttpError(400, 'Missing required fields')
+    
+    with db_cursor() as cursor:
+        cursor.execute(
+            "UPDATE users SET telegram_id = %s, telegram_username = %s WHERE id = %s RETURNING id, email, telegram_id, telegram_username",
+            (telegram_id, telegram_username, user_id)
+        )
+        user = cursor.fetchone()
+        cursor.connection.commit()
+    
+    if not user:
+        raise HttpError(404, 'User not found')
+    return build_response(200, {'success': True, 'user': dict(user)})
+
+
+ROUTES: Dict[Tuple[str, str], Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    ('POST', '/notify-order'): notify_order,
+    ('POST', '/link-account'): link_account,
+    ('POST', '/drain-outbox'): drain
+}
+
+
+def resolve_path(event: Dict[str, Any]) -> str:
     raw_path = event.get('requestContext', {}).get('http', {}).get('path', '')
     if not raw_path:
-        raw_path = query_params.get('path', '')
-    
-    path = ''
-    if '/notify-order' in raw_path:
-        path = '/notify-order'
-    elif '/link-account' in raw_path:
-        path = '/link-account'
-    
-    if method == 'POST' and path == '/notify-order':
-        body = json.loads(event.get('body', '{}'))
-        order_id = body.get('order_id')
-        user_name = body.get('user_name', 'Гость')
-        total_amount = body.get('total_amount', 0)
-        items = body.get('items', [])
-        telegram_chat_id = body.get('telegram_chat_id')
-        
-        if not telegram_chat_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Telegram chat ID required'}),
-                'isBase64Encoded': False
-            }
+        raw_path = (event.get('queryStringParameters', {}) or {}).get('path', '')
+    match = ROUTE_PATTERN.search(raw_path)
+    return match.group(0) if match else ''
+
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    body = json.loads(event.get('body') or '{}')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'JSON body must be an object')
+    return body
+
+
+def build_response(status_code: int, body: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    with span('serialize'):
+        payload = json.dumps(body, default=str)
+    return {
+        'statusCode': status_code,
+        'headers': {**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        'body': payload,
+        'isBase64Encoded': False
+    }
+
+
+@contextmanager
+def span(name: str, detail: Optional[str] = None) -> Iterator[None]:
+    '''Time the block as a trace span; a no-op unless the current invocation is traced'''
+    spans = _trace_spans
+    if spans is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, (time.perf_counter() - started_at) * 1000, detail))
+
+
+def lazy_import(name: str) -> Any:
+    '''Import a heavy dependency on first use, so preflights and cached answers never load it'''
+    module = _lazy_modules.get(name)
+    if module is None:
+        with span('import', name):
+            module = _lazy_modules[name] = importlib.import_module(name)
+    return module
+
+
+def cursor_factory() -> Any:
+    '''RealDictCursor subclass that records every statement as an sql span with its whitespace-normalized text'''
+    global _cursor_factory
+    if _cursor_factory is None:
+        extras = lazy_import('psycopg2.extras')
         
-        items_text = '\n'.join([
-            f"• {item.get('name')} x{item.get('quantity')} - {item.get('price')} ₽"
-            for item in items
-        ])
+        class TracedCursor(extras.RealDictCursor):
+            def execute(self, query: str, vars: Any = None) -> None:
+                if _trace_spans is None:
+                    return super().execute(query, vars)
+                with span('sql', ' '.join(query.split())[:TRACE_SQL_MAX_LENGTH]):
+                    return super().execute(query, vars)
         
-        message = f"""
+        _cursor_factory = TracedCursor
+    return _cursor_factory
+
+
+@contextmanager
+def db_cursor() -> Iterator[Any]:
+    '''Yield a RealDictCursor on a pooled connection; uncommitted work is rolled back on release'''
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        raise HttpError(500, 'Database not configured')
+    conn = get_db_connection(database_url)
+    cursor = conn.cursor(cursor_factory=cursor_factory())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+        release_db_connection(conn)
+
+
+def format_order_message(order_id: Any, user_name: str, total_amount: Any, items: List[Dict[str, Any]]) -> str:
+    items_text = '\n'.join([
+        f"• {item.get('name')} x{item.get('quantity')} - {item.get('price')} ₽"
+        for item in items
+    ])
+    
+    return f"""
 🛍 Новый заказ #{order_id}
 
 👤 Клиент: {user_name}
@@ -84,74 +307,305 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 {items_text}
 
 Перейдите в админ-панель для обработки заказа.
-        """.strip()
-        
-        telegram_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        response = requests.post(telegram_url, json={
-            'chat_id': telegram_chat_id,
-            'text': message,
-            'parse_mode': 'HTML'
-        })
-        
-        if response.status_code == 200:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'message': 'Notification sent'}),
-                'isBase64Encoded': False
-            }
-        else:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Failed to send notification', 'details': response.text}),
-                'isBase64Encoded': False
-            }
-    
-    if method == 'POST' and path == '/link-account':
-        body = json.loads(event.get('body', '{}'))
-        user_id = body.get('user_id')
-        telegram_id = body.get('telegram_id')
-        telegram_username = body.get('telegram_username')
-        
-        if not database_url or not user_id or not telegram_id:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Missing required fields'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(database_url)
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
-        
+    """.strip()
+
+
+def drain_outbox(cursor: Any, bot_token: str) -> Dict[str, int]:
+    '''
+    Send one batch of due outbox messages from TELEGRAM_SEND_CONCURRENCY
+    workers sharing one rate limiter, so the batch stays under Telegram limits.
+    The batch is claimed by pushing next_attempt_at past OUTBOX_LEASE_SECONDS and
+    committing, so no transaction stays open while the Bot API is called; each
+    row is then marked in its own short transaction as soon as its send ends.
+    A drain that dies mid-batch leaves its rows to be retried when the lease runs
+    out; failures are rescheduled with exponential backoff.
+    '''
+    cursor.execute(
+        """WITH claimed AS (
+               UPDATE telegram_outbox ob
+               SET next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', attempts = ob.attempts + 1
+               FROM (
+                   SELECT id FROM telegram_outbox
+                   WHERE sent_at IS NULL AND next_attempt_at <= CURRENT_TIMESTAMP AND attempts < %s
+                   ORDER BY next_attempt_at, id
+                   LIMIT %s
+                   FOR UPDATE SKIP LOCKED
+               ) due
+               WHERE ob.id = due.id
+               RETURNING ob.id, ob.chat_id, ob.order_id, ob.kind, ob.text, ob.attempts
+           )
+           SELECT c.*, o.total_amount, u.full_name as user_name, i.items
+           FROM claimed c
+           LEFT JOIN orders o ON o.id = c.order_id
+           LEFT JOIN users u ON u.id = o.user_id
+           LEFT JOIN LATERAL (
+               SELECT json_agg(json_build_object(
+                   'name', oi.product_name,
+                   'quantity', oi.quantity,
+                   'price', oi.product_price
+               ) ORDER BY oi.id) as items
+               FROM order_items oi
+               WHERE oi.order_id = c.order_id
+           ) i ON TRUE
+           ORDER BY c.id""",
+        (OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS, OUTBOX_BATCH_SIZE)
+    )
+    rows = cursor.fetchall()
+    cursor.connection.commit()
+    
+    result = {'sent': 0, 'failed': 0, 'deferred': 0}
+    deadline = time.monotonic() + OUTBOX_DRAIN_BUDGET_SECONDS
+    with ThreadPoolExecutor(max_workers=TELEGRAM_SEND_CONCURRENCY) as executor:
+        jobs = {executor.submit(_deliver_outbox_row, row, bot_token, deadline): row for row in rows}
+        for job in as_completed(jobs):
+            try:
+                outcome, delay, error = job.result()
+            except Exception as e:
+                traceback.print_exc()
+                outcome, delay, error = 'failed', OUTBOX_BACKOFF_BASE_SECONDS, str(e)
+            record_outbox_outcome(cursor, jobs[job], outcome, delay, error)
+            cursor.connection.commit()
+            result[outcome] += 1
+    
+    return result
+
+
+def record_outbox_outcome(cursor: Any, row: Dict[str, Any], outcome: str, delay: float, error: str) -> None:
+    '''Settle one claimed row: mark it sent, reschedule it after a failure, or hand a deferred one back unchanged'''
+    if outcome == 'sent':
         cursor.execute(
-            "UPDATE users SET telegram_id = %s, telegram_username = %s WHERE id = %s RETURNING id, email, telegram_id, telegram_username",
-            (telegram_id, telegram_username, user_id)
+            """WITH sent AS (
+                   UPDATE telegram_outbox SET sent_at = CURRENT_TIMESTAMP WHERE id = %s RETURNING order_id, kind
+               )
+               UPDATE orders SET telegram_notified = TRUE
+               FROM sent
+               WHERE orders.id = sent.order_id AND sent.kind = 'new_order'""",
+            (row['id'],)
         )
-        user = cursor.fetchone()
-        conn.commit()
-        cursor.close()
-        conn.close()
+    elif outcome == 'failed':
+        cursor.execute(
+            """UPDATE telegram_outbox
+               SET next_attempt_at = CURRENT_TIMESTAMP + %s * INTERVAL '1 second', last_error = %s
+               WHERE id = %s""",
+            (delay, error[:500], row['id'])
+        )
+    else:
+        cursor.execute(
+            "UPDATE telegram_outbox SET next_attempt_at = CURRENT_TIMESTAMP, attempts = attempts - 1 WHERE id = %s",
+            (row['id'],)
+        )
+
+
+def run_outbox_worker(bot_token: str) -> None:
+    '''
+    Drain the outbox in a loop, for hosts that can keep a process running instead of
+    scheduling POST /drain-outbox. Full batches are followed up immediately; an idle or
+    failing drain waits OUTBOX_POLL_SECONDS so backed-off rows are retried on time.
+    '''
+    while True:
+        try:
+            with db_cursor() as cursor:
+                result = drain_outbox(cursor, bot_token)
+        except Exception:
+            traceback.print_exc()
+            result = {'sent': 0}
+        if result['sent'] < OUTBOX_BATCH_SIZE:
+            time.sleep(OUTBOX_POLL_SECONDS)
+
+
+def telegram_api_call(bot_token: str, api_method: str, payload: Dict[str, Any]) -> Any:
+    '''POST to the Bot API over the shared keep-alive session, retrying 429s that ask for a short wait'''
+    requests = lazy_import('requests')
+    session = telegram_session()
+    url = f"{TELEGRAM_API_URL}/bot{bot_token}/{api_method}"
+    attempt = 0
+    while True:
+        started_at = time.perf_counter()
+        try:
+            with span('telegram', api_method):
+                response = session.post(url, json=payload, timeout=TELEGRAM_TIMEOUT_SECONDS)
+        except requests.RequestException:
+            _telegram_stats['errors'] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            _telegram_stats['calls'] += 1
+            _telegram_stats['total_ms'] += elapsed_ms
+            _telegram_stats['max_ms'] = max(_telegram_stats['max_ms'], elapsed_ms)
         
-        if user:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'user': dict(user)}),
-                'isBase64Encoded': False
-            }
-        else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'User not found'}),
-                'isBase64Encoded': False
-            }
+        if response.status_code != 429 or attempt >= TELEGRAM_MAX_RETRIES:
+            return response
+        retry_after = telegram_retry_after(response)
+        if retry_after > TELEGRAM_MAX_RETRY_WAIT_SECONDS:
+            return response
+        _telegram_stats['retries'] += 1
+        attempt += 1
+        time.sleep(retry_after)
+
+
+def telegram_session() -> Any:
+    '''Keep-alive Bot API session, created on the first call so the webhook cold start skips requests'''
+    global _telegram_session
+    if _telegram_session is not None:
+        return _telegram_session
+    with _telegram_session_lock:
+        if _telegram_session is None:
+            requests = lazy_import('requests')
+            adapter_options = {'pool_connections': 1, 'pool_maxsize': TELEGRAM_POOL_SIZE}
+            session = requests.Session()
+            session.mount('https://', requests.adapters.HTTPAdapter(**adapter_options))
+            session.mount('http://', requests.adapters.HTTPAdapter(**adapter_options))
+            _telegram_session = session
+    return _telegram_session
+
+
+def telegram_retry_after(response: Any, default: float = 1.0) -> float:
+    try:
+        return float(response.json()['parameters']['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        return default
+
+
+def telegram_stats() -> Dict[str, float]:
+    calls = _telegram_stats['calls']
+    return {**_telegram_stats, 'avg_ms': _telegram_stats['total_ms'] / calls if calls else 0.0}
+
+
+def _deliver_outbox_row(row: Dict[str, Any], bot_token: str, deadline: float) -> Tuple[str, float, str]:
+    if not _wait_for_send_slot(row['chat_id'], deadline):
+        return 'deferred', 0.0, ''
+    
+    text = row['text'] or format_order_message(
+        row['order_id'], row['user_name'] or 'Гость', row['total_amount'] or 0, row['items'] or []
+    )
+    backoff = min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (row['attempts'] - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+    
+    try:
+        response = telegram_api_call(bot_token, 'sendMessage', {
+            'chat_id': row['chat_id'],
+            'text': text,
+            'parse_mode': 'HTML'
+        })
+    except lazy_import('requests').RequestException as e:
+        return 'failed', backoff, str(e)
     
+    if response.status_code == 200:
+        return 'sent', 0.0, ''
+    if response.status_code == 429:
+        retry_after = telegram_retry_after(response, backoff)
+        _pause_sending(retry_after)
+        return 'failed', retry_after, response.text
+    return 'failed', backoff, response.text
+
+
+def _wait_for_send_slot(chat_id: int, deadline: float) -> bool:
+    '''
+    Reserve the next send slot allowed by both the global and the per-chat
+    Telegram rate limits and sleep until it comes; False if it is past the deadline.
+    Chats whose interval has passed are forgotten when a new chat is added, so the
+    table only holds chats sent to within the last TELEGRAM_CHAT_INTERVAL_SECONDS.
+    '''
+    global _next_send_at
+    with _send_slot_lock:
+        now = time.monotonic()
+        ready_at = max(now, _next_send_at, _chat_next_send_at.get(chat_id, 0.0))
+        if ready_at > deadline:
+            return False
+        if chat_id not in _chat_next_send_at:
+            for idle_chat_id in [key for key, next_at in _chat_next_send_at.items() if next_at <= now]:
+                del _chat_next_send_at[idle_chat_id]
+        _next_send_at = ready_at + 1.0 / TELEGRAM_GLOBAL_RATE_PER_SECOND
+        _chat_next_send_at[chat_id] = ready_at + TELEGRAM_CHAT_INTERVAL_SECONDS
+    if ready_at > now:
+        time.sleep(ready_at - now)
+    return True
+
+
+def _pause_sending(seconds: float) -> None:
+    global _next_send_at
+    with _send_slot_lock:
+        _next_send_at = max(_next_send_at, time.monotonic() + seconds)
+
+
+def get_db_connection(database_url: str) -> Any:
+    '''Take a warm connection from the container-wide pool or open a new one'''
+    while True:
+        with _db_pool_lock:
+            if not _db_pool:
+                _db_pool_stats['misses'] += 1
+                break
+            conn, released_at = _db_pool.pop()
+        idle_for = time.monotonic() - released_at
+        if conn.closed or idle_for > DB_POOL_MAX_IDLE_SECONDS:
+            _close_quietly(conn)
+            _db_pool_stats['evictions'] += 1
+            continue
+        if idle_for > DB_POOL_PING_AFTER_SECONDS and not _ping(conn):
+            _close_quietly(conn)
+            _db_pool_stats['reconnects'] += 1
+            return _connect(database_url)
+        _db_pool_stats['hits'] += 1
+        return conn
+    return _connect(database_url)
+
+
+def release_db_connection(conn: Any) -> None:
+    '''Return a connection to the pool, dropping it when broken or the pool is full'''
+    psycopg2 = lazy_import('psycopg2')
+    if conn.closed:
+        return
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except psycopg2.Error:
+        _close_quietly(conn)
+        return
+    with _db_pool_lock:
+        if len(_db_pool) < DB_POOL_MAX_SIZE:
+            _db_pool.append((conn, time.monotonic()))
+            return
+    _close_quietly(conn)
+
+
+def db_pool_stats() -> Dict[str, int]:
+    with _db_pool_lock:
+        return {**_db_pool_stats, 'idle': len(_db_pool)}
+
+
+def runtime_stats() -> Dict[str, Any]:
+    '''Container-lifetime counters of every cache, pool and client in this function, logged with each trace'''
     return {
-        'statusCode': 404,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Not found'}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+        'db_pool': db_pool_stats(),
+        'telegram': telegram_stats()
+    }
+
+
+def _connect(database_url: str) -> Any:
+    psycopg2 = lazy_import('psycopg2')
+    with span('db.connect'):
+        return psycopg2.connect(database_url)
+
+
+def _ping(conn: Any) -> bool:
+    psycopg2 = lazy_import('psycopg2')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+INIT_MS = round((time.perf_counter() - _init_started_at) * 1000, 2)
+
+
+if __name__ == '__main__':
+    run_outbox_worker(os.environ['TELEGRAM_BOT_TOKEN'])
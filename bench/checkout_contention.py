@@ -0,0 +1,152 @@
+'''
+Business: Lock-contention test for checkout - many worker processes each order their own product, so nothing but shared bookkeeping (such as the sales rollups) makes them wait on each other; reports throughput, latency and how many sessions sat in lock waits
+Args: --workers, --orders, --ref (repeatable; "worktree" is the checked-out code, a git ref also supplies that revision's migrations)
+Returns: Table of orders per second, p50/p99 latency and average sessions waiting on row locks and on the commit-time NOTIFY lock per revision
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench.common import disposable_database, latency_summary, load_function
+
+LOCK_SAMPLE_SECONDS = 0.005
+
+_orders: Any = None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--orders', type=int, default=100, help='orders each worker places')
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. 1c2d3e4~1; defaults to the worktree')
+    args = parser.parse_args(argv)
+
+    print(f"{'revision':<16} {'orders/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'row waits':>10} {'notify waits':>13}")
+    failed = False
+    for ref in args.ref or ['worktree']:
+        function_ref = None if ref == 'worktree' else ref
+        with disposable_database(ref=function_ref) as database_url:
+            product_ids, user_id = seed(database_url, args.workers, args.orders)
+            sampler = LockSampler(database_url)
+            start_at = time.time() + 1.0
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+                jobs = [
+                    pool.submit(place_orders, database_url, function_ref, product_id, user_id, args.orders, start_at)
+                    for product_id in product_ids
+                ]
+                time.sleep(max(0.0, start_at - time.time()))
+                sampler.start()
+                started_at = time.perf_counter()
+                results = [outcome for job in jobs for outcome in job.result()]
+                elapsed = time.perf_counter() - started_at
+                sampler.stop()
+        statuses = {status for status, _ in results}
+        if statuses != {200}:
+            print(f'{ref}: unexpected statuses {sorted(statuses)}', file=sys.stderr)
+            failed = True
+        latency = latency_summary([ms for _, ms in results])
+        print(f"{ref:<16} {len(results) / elapsed:>9.0f} {latency['p50_ms']:>8.2f} {latency['p99_ms']:>8.2f} "
+              f"{sampler.average('row'):>10.2f} {sampler.average('notify'):>13.2f}")
+    return 1 if failed else 0
+
+
+def place_orders(database_url: str, ref: Optional[str], product_id: int, user_id: int, count: int,
+                 start_at: float) -> List[Tuple[int, float]]:
+    '''One function instance ordering its own product in a loop from the common start'''
+    global _orders
+    if _orders is None:
+        os.environ['DATABASE_URL'] = database_url
+        _orders = load_function('orders', ref)
+        _orders.handler({'httpMethod': 'PUT', 'body': '{}'}, None)
+    body = json.dumps({
+        'user_id': user_id,
+        'items': [{'id': product_id, 'name': 'Contention SKU', 'price': 1000, 'quantity': 1, 'selectedSize': 'One Size'}],
+        'total_amount': 1000,
+        'delivery_address': 'Bench street 1',
+        'delivery_phone': '+7 000 000-00-00'
+    })
+    time.sleep(max(0.0, start_at - time.time()))
+    outcomes = []
+    for _ in range(count):
+        started_at = time.perf_counter()
+        response = _orders.handler({'httpMethod': 'POST', 'headers': {}, 'body': body}, None)
+        outcomes.append((response['statusCode'], (time.perf_counter() - started_at) * 1000))
+    return outcomes
+
+
+class LockSampler:
+    '''
+    Polls pg_locks from its own connection and averages the sessions waiting, split into
+    row locks (another transaction holds a row this one updates) and the database-wide
+    lock a committing transaction takes to queue its NOTIFY
+    '''
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+        self.samples: List[Dict[str, int]] = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def average(self, kind: str) -> float:
+        return sum(sample[kind] for sample in self.samples) / len(self.samples) if self.samples else 0.0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        import psycopg2
+        from psycopg2.extras import RealDictCursor
+
+        conn = psycopg2.connect(self.database_url)
+        conn.autocommit = True
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                while not self._stopped.wait(LOCK_SAMPLE_SECONDS):
+                    cursor.execute(
+                        """SELECT count(*) FILTER (WHERE l.locktype IN ('transactionid', 'tuple')) as row,
+                                  count(*) FILTER (WHERE l.locktype = 'object' AND l.classid = 'pg_database'::regclass) as notify
+                           FROM pg_locks l
+                           JOIN pg_stat_activity a ON a.pid = l.pid
+                           WHERE NOT l.granted AND a.datname = current_database()"""
+                    )
+                    self.samples.append(cursor.fetchone())
+        finally:
+            conn.close()
+
+
+def seed(database_url: str, workers: int, orders: int) -> Tuple[List[int], int]:
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO products (name, price, category, sizes, stock)
+                   SELECT 'Contention SKU ' || n, 1000, 'bench', ARRAY['One Size'], %s
+                   FROM generate_series(1, %s) n
+                   RETURNING id""",
+                (orders, workers)
+            )
+            product_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("INSERT INTO users (email, password_hash) VALUES ('contention@example.com', '-') RETURNING id")
+            user_id = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return product_ids, user_id
+
+
+if __name__ == '__main__':
+    sys.exit(main())
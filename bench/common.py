@@ -0,0 +1,353 @@
+'''
+Business: Shared plumbing for the local benchmarks - disposable Postgres databases, loading function handlers in-process, tests.json events, database round-trip counting and a fake Telegram API
+Args: BENCH_DATABASE_URL points at a Postgres server the benchmarks may create and drop databases on
+Returns: Helpers imported by the bench.* scripts
+'''
+
+import base64
+import importlib.util
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import ModuleType
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = REPO_ROOT / 'backend'
+MIGRATIONS_DIR = REPO_ROOT / 'db_migrations'
+
+FUNCTIONS = ('auth', 'orders', 'products', 'telegram', 'telegram-bot', 'favorites')
+
+DEFAULT_ADMIN_URL = 'postgresql://postgres@localhost:5432/postgres'
+
+
+def admin_url() -> str:
+    return os.environ.get('BENCH_DATABASE_URL', DEFAULT_ADMIN_URL)
+
+
+def database_url(server_url: str, name: str) -> str:
+    '''Same server and credentials as server_url, different database'''
+    parts = urlsplit(server_url)
+    return urlunsplit((parts.scheme, parts.netloc, f'/{name}', parts.query, parts.fragment))
+
+
+@contextmanager
+def disposable_database(migrate: bool = True, ref: Optional[str] = None) -> Iterator[str]:
+    '''
+    Create a throwaway database with every migration applied and drop it afterwards.
+    With a git ref the schema comes from that revision's db_migrations instead.
+    '''
+    import psycopg2
+
+    server_url = admin_url()
+    name = f'bench_{uuid.uuid4().hex[:12]}'
+    admin = psycopg2.connect(server_url)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(f'CREATE DATABASE {name}')
+        url = database_url(server_url, name)
+        if migrate:
+            apply_migrations(url, ref)
+        yield url
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS {name} WITH (FORCE)')
+        admin.close()
+
+
+def migration_files() -> List[Path]:
+    return sorted(MIGRATIONS_DIR.glob('V*__*.sql'), key=migration_version)
+
+
+def migration_version(path: Path) -> int:
+    return int(path.name[1:].split('__')[0])
+
+
+def migration_sources(ref: Optional[str] = None) -> List[str]:
+    '''SQL of every migration in order, from the worktree or from a git revision'''
+    if ref is None:
+        return [path.read_text(encoding='utf-8') for path in migration_files()]
+    listed = subprocess.run(
+        ['git', 'ls-tree', '--name-only', f'{ref}:db_migrations'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    ).stdout.split()
+    names = sorted((Path(name) for name in listed if name.startswith('V') and '__' in name), key=migration_version)
+    return [
+        subprocess.run(['git', 'show', f'{ref}:db_migrations/{name}'], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout
+        for name in names
+    ]
+
+
+def apply_migrations(url: str, ref: Optional[str] = None) -> None:
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            for sql in migration_sources(ref):
+                cursor.execute(sql)
+    finally:
+        conn.close()
+
+
+def function_path(name: str, ref: Optional[str] = None) -> Path:
+    '''backend/<name>/index.py, or that revision of it written to a temporary directory'''
+    path = BACKEND_DIR / name / 'index.py'
+    if ref is not None:
+        shown = subprocess.run(['git', 'show', f'{ref}:backend/{name}/index.py'], cwd=REPO_ROOT, capture_output=True)
+        if shown.returncode != 0:
+            raise FileNotFoundError(f'backend/{name}/index.py does not exist at {ref}')
+        path = Path(tempfile.mkdtemp(prefix='bench_')) / 'index.py'
+        path.write_bytes(shown.stdout)
+    return path
+
+
+def load_function(name: str, ref: Optional[str] = None) -> ModuleType:
+    '''
+    Import backend/<name>/index.py as its own module so several functions (or several
+    revisions of one function, via a git ref) can be driven side by side in one process.
+    '''
+    path = function_path(name, ref)
+    module_name = f"bench_{name.replace('-', '_')}_{ref or 'worktree'}".replace('~', '_').replace('^', '_')
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_scenarios(name: str) -> List[Dict[str, Any]]:
+    with open(BACKEND_DIR / name / 'tests.json', encoding='utf-8') as f:
+        return json.load(f)['tests']
+
+
+def scenario_event(scenario: Dict[str, Any]) -> Dict[str, Any]:
+    '''Cloud-function event equivalent to a tests.json scenario'''
+    path, _, query = scenario.get('path', '/').partition('?')
+    body = scenario.get('body')
+    return {
+        'httpMethod': scenario.get('method', 'GET'),
+        'path': path,
+        'queryStringParameters': dict(parse_qsl(query)) or None,
+        'headers': dict(scenario.get('headers', {})),
+        'body': json.dumps(body, ensure_ascii=False) if body is not None else None,
+        'isBase64Encoded': False,
+        'requestContext': {'identity': {'sourceIp': '127.0.0.1'}}
+    }
+
+
+_round_trips = 0
+_round_trips_lock = threading.Lock()
+_captured: Optional[List[Tuple[Any, Any]]] = None
+
+
+def _count_round_trip() -> None:
+    global _round_trips
+    with _round_trips_lock:
+        _round_trips += 1
+
+
+def count_round_trips() -> None:
+    '''
+    Make every psycopg2 connection opened from now on count its round trips: connects,
+    statements, commits and rollbacks. Works for any revision of the functions because
+    it wraps psycopg2.connect itself; call it before the first request.
+    '''
+    import psycopg2
+    import psycopg2.extensions
+
+    if getattr(psycopg2.connect, 'counting', False):
+        return
+    cursor_classes: Dict[type, type] = {}
+
+    def counting_cursor(base: type) -> type:
+        if base not in cursor_classes:
+            class CountingCursor(base):
+                def execute(self, query: Any, vars: Any = None) -> Any:
+                    _count_round_trip()
+                    if _captured is not None:
+                        _captured.append((self.mogrify(query, vars), self.name))
+                    return super().execute(query, vars)
+
+                def executemany(self, query: Any, vars_list: Any) -> Any:
+                    _count_round_trip()
+                    return super().executemany(query, vars_list)
+
+            cursor_classes[base] = CountingCursor
+        return cursor_classes[base]
+
+    class CountingConnection(psycopg2.extensions.connection):
+        def cursor(self, *args: Any, **kwargs: Any) -> Any:
+            kwargs['cursor_factory'] = counting_cursor(
+                kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+            )
+            return super().cursor(*args, **kwargs)
+
+        def commit(self) -> None:
+            _count_round_trip()
+            super().commit()
+
+        def rollback(self) -> None:
+            _count_round_trip()
+            super().rollback()
+
+    connect = psycopg2.connect
+
+    def counting_connect(*args: Any, **kwargs: Any) -> Any:
+        _count_round_trip()
+        return connect(*args, connection_factory=CountingConnection, **kwargs)
+
+    counting_connect.counting = True
+    psycopg2.connect = counting_connect
+
+
+def round_trips() -> int:
+    return _round_trips
+
+
+@contextmanager
+def capture_statements() -> Iterator[List[Tuple[bytes, Optional[str]]]]:
+    '''Collect every statement executed meanwhile, with parameters bound, as (sql, cursor name)'''
+    global _captured
+    count_round_trips()
+    _captured = statements = []
+    try:
+        yield statements
+    finally:
+        _captured = None
+
+
+def invoke_counted(module: ModuleType, event: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    '''
+    Run one request and return its response with the number of database round trips it
+    made. The counter is process-wide, so nothing else may run concurrently.
+    '''
+    count_round_trips()
+    before = round_trips()
+    response = module.handler(event, None)
+    return response, round_trips() - before
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    '''Nearest-rank percentile of samples'''
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        'p50_ms': round(percentile(samples_ms, 0.50), 3),
+        'p95_ms': round(percentile(samples_ms, 0.95), 3),
+        'p99_ms': round(percentile(samples_ms, 0.99), 3),
+        'max_ms': round(max(samples_ms, default=0.0), 3)
+    }
+
+
+class LocalServer(ThreadingHTTPServer):
+    # The default backlog of 5 overflows under load and stalls clients for a SYN retry (~1s)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class FakeTelegram:
+    '''Local stand-in for api.telegram.org that accepts every Bot API call and records it'''
+
+    def __init__(self) -> None:
+        self.calls: List[Tuple[str, Dict[str, Any]]] = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length') or 0)
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                with fake._lock:
+                    fake.calls.append((self.path.rsplit('/', 1)[-1], payload))
+                body = json.dumps({'ok': True, 'result': {'message_id': len(fake.calls)}}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = LocalServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self) -> 'FakeTelegram':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HttpShim:
+    '''
+    Serve loaded function modules over local HTTP the way the platform gateway does:
+    /<function>/<path>?<query> becomes an event for that function's handler.
+    '''
+
+    def __init__(self, modules: Dict[str, ModuleType]) -> None:
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle_one(self) -> None:
+                parts = urlsplit(self.path)
+                function, _, path = parts.path.lstrip('/').partition('/')
+                module = modules.get(function)
+                if module is None:
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8') if length else None
+                response = module.handler({
+                    'httpMethod': self.command,
+                    'path': f'/{path}',
+                    'queryStringParameters': dict(parse_qsl(parts.query)) or None,
+                    'headers': dict(self.headers.items()),
+                    'body': body,
+                    'isBase64Encoded': False,
+                    'requestContext': {'http': {'path': f'/{path}'}, 'identity': {'sourceIp': self.client_address[0]}}
+                }, None)
+                payload = response.get('body') or ''
+                raw = base64.b64decode(payload) if response.get('isBase64Encoded') else payload.encode('utf-8')
+                self.send_response(response['statusCode'])
+                for key, value in response.get('headers', {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_OPTIONS = handle_one
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self.server = LocalServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self) -> 'HttpShim':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
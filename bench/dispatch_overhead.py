@@ -0,0 +1,96 @@
+'''
+Business: Microbenchmark of per-request CPU time spent in routing, validation and response building - the paths that never reach the database - for several git revisions of every function
+Args: --iterations, --ref (repeatable; "worktree" is the checked-out code)
+Returns: CPU microseconds per request for each function, request shape and revision
+'''
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from bench.common import disposable_database, load_function
+
+REQUESTS: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {
+    'auth': [
+        ('preflight', {'httpMethod': 'OPTIONS'}),
+        ('unknown route', {'httpMethod': 'GET', 'queryStringParameters': {'path': '/unknown'}}),
+        ('invalid JSON', {'httpMethod': 'POST', 'queryStringParameters': {'path': '/login'}, 'body': '{'}),
+        ('missing fields', {'httpMethod': 'POST', 'queryStringParameters': {'path': '/register'}, 'body': '{}'})
+    ],
+    'orders': [
+        ('preflight', {'httpMethod': 'OPTIONS'}),
+        ('unknown method', {'httpMethod': 'DELETE'}),
+        ('invalid JSON', {'httpMethod': 'POST', 'body': '{'}),
+        ('missing fields', {'httpMethod': 'PUT', 'body': '{}'})
+    ],
+    'products': [
+        ('preflight', {'httpMethod': 'OPTIONS'}),
+        ('cached list', {'httpMethod': 'GET', 'queryStringParameters': {'path': '/list'}}),
+        ('search without query', {'httpMethod': 'GET', 'queryStringParameters': {'path': '/search'}})
+    ],
+    'telegram': [
+        ('preflight', {'httpMethod': 'OPTIONS'}),
+        ('invalid JSON', {'httpMethod': 'POST', 'queryStringParameters': {'path': '/notify-order'}, 'body': '{'}),
+        ('missing fields', {'httpMethod': 'POST', 'queryStringParameters': {'path': '/notify-order'}, 'body': '{}'})
+    ],
+    'telegram-bot': [
+        ('preflight', {'httpMethod': 'OPTIONS'}),
+        ('invalid JSON', {'httpMethod': 'POST', 'body': '{'}),
+        ('update without message', {'httpMethod': 'POST', 'body': '{}'})
+    ]
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=20_000)
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. 9d66559~1; defaults to the worktree')
+    args = parser.parse_args(argv)
+    refs = args.ref or ['worktree']
+
+    with disposable_database() as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        print(f"{'function':<13} {'request':<24}" + ''.join(f' {ref[:14]:>14}' for ref in refs))
+        for name, requests in REQUESTS.items():
+            modules = [load_revision(name, ref) for ref in refs]
+            for label, event in requests:
+                cells = []
+                for module in modules:
+                    if module is None:
+                        cells.append('-')
+                        continue
+                    status, micros = cpu_per_request(module, event, args.iterations)
+                    cells.append(f'{micros:>8.1f}us {status:>3}')
+                print(f'{name:<13} {label:<24}' + ''.join(f' {cell:>14}' for cell in cells))
+    return 0
+
+
+def load_revision(name: str, ref: str) -> Optional[Any]:
+    try:
+        return load_function(name, None if ref == 'worktree' else ref)
+    except FileNotFoundError:
+        return None
+
+
+def cpu_per_request(module: Any, event: Dict[str, Any], iterations: int) -> Tuple[str, float]:
+    '''
+    Thread CPU time per handler call after a warm-up call, so one-off imports are not
+    counted. Revisions that let an exception escape (a 502 from the gateway) report "exc".
+    '''
+    def call() -> str:
+        try:
+            return str(module.handler(dict(event), None)['statusCode'])
+        except Exception:
+            return 'exc'
+
+    status = call()
+    started_at = time.thread_time_ns()
+    for _ in range(iterations):
+        call()
+    return status, (time.thread_time_ns() - started_at) / iterations / 1000
+
+
+if __name__ == '__main__':
+    sys.exit(main())
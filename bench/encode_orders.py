@@ -0,0 +1,171 @@
+'''
+Business: Serialization check for a 10k-order page - fetch the same orders with their items and users both ways the orders function has encoded them: dict rows through json.dumps(default=str), and documents rendered by Postgres with row_to_json joined into encoded_response
+Args: --orders, --items-per-order, --iterations, --baseline, --update-baseline, --tolerance
+Returns: Exit code 1 when the row_to_json path encodes no faster than json.dumps or its total time grows past the stored baseline
+'''
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from bench.common import disposable_database, load_function
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines.json'
+BASELINE_KEY = 'encode_orders'
+LATENCY_SLACK_MS = 5.0
+
+PAGE_QUERY = """
+    SELECT o.*, u.email as user_email, u.full_name as user_name, COALESCE(i.items, '[]'::json) as items
+    FROM (
+        SELECT * FROM orders o
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT %s
+    ) o
+    LEFT JOIN users u ON o.user_id = u.id
+    LEFT JOIN LATERAL (
+        SELECT json_agg(json_build_object(
+            'id', oi.id,
+            'product_name', oi.product_name,
+            'product_price', oi.product_price,
+            'quantity', oi.quantity,
+            'selected_size', oi.selected_size
+        ) ORDER BY oi.id) as items
+        FROM order_items oi
+        WHERE oi.order_id = o.id
+    ) i ON TRUE"""
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--items-per-order', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='allowed growth over the baseline, as a ratio')
+    args = parser.parse_args(argv)
+
+    with disposable_database() as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        seed(database_url, args.orders, args.items_per_order)
+        orders = load_function('orders')
+        ways: Dict[str, Callable[[Any], Tuple[float, float, str]]] = {
+            'json_dumps': lambda cursor: encode_with_json_dumps(cursor, args.orders),
+            'row_to_json': lambda cursor: encode_with_row_to_json(cursor, orders, args.orders)
+        }
+        results = {name: measure(database_url, way, args.iterations) for name, way in ways.items()}
+
+    print(f"{args.orders} orders with {args.items_per_order} items each")
+    print(f"{'path':<12} {'query ms':>9} {'encode ms':>10} {'total ms':>9} {'MB':>6}")
+    for name, result in results.items():
+        print(f"{name:<12} {result['query_ms']:>9.2f} {result['encode_ms']:>10.2f} {result['total_ms']:>9.2f} "
+              f"{result['bytes'] / 2**20:>6.1f}")
+
+    failures = []
+    if results['row_to_json']['encode_ms'] >= results['json_dumps']['encode_ms']:
+        failures.append('row_to_json encodes no faster than json.dumps')
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        baselines[BASELINE_KEY] = {
+            name: {key: result[key] for key in ('query_ms', 'encode_ms', 'total_ms')} for name, result in results.items()
+        }
+        args.baseline.write_text(json.dumps(baselines, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+        print(f'Baseline written to {args.baseline}')
+    else:
+        expected = baselines.get(BASELINE_KEY, {}).get('row_to_json')
+        actual = results['row_to_json']['total_ms']
+        if expected is not None and actual > max(expected['total_ms'] * (1 + args.tolerance), expected['total_ms'] + LATENCY_SLACK_MS):
+            failures.append(f"row_to_json page takes {actual} ms, baseline {expected['total_ms']} ms")
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def encode_with_json_dumps(cursor: Any, limit: int) -> Tuple[float, float, str]:
+    '''The list response before Postgres rendered it: psycopg2 parses items, every row is copied and dumped'''
+    started_at = time.perf_counter()
+    cursor.execute(PAGE_QUERY + "\nORDER BY o.created_at DESC, o.id DESC", (limit,))
+    rows = cursor.fetchall()
+    fetched_at = time.perf_counter()
+    body = json.dumps({'orders': [dict(row) for row in rows], 'next_cursor': None}, default=str)
+    return (fetched_at - started_at) * 1000, (time.perf_counter() - fetched_at) * 1000, body
+
+
+def encode_with_row_to_json(cursor: Any, orders: Any, limit: int) -> Tuple[float, float, str]:
+    '''The list response today: one JSON document per row from Postgres, joined into the body'''
+    started_at = time.perf_counter()
+    cursor.execute(
+        f"SELECT r.created_at, r.id, row_to_json(r)::text as doc FROM ({PAGE_QUERY}) r ORDER BY r.created_at DESC, r.id DESC",
+        (limit,)
+    )
+    rows = cursor.fetchall()
+    fetched_at = time.perf_counter()
+    documents = ','.join(row['doc'] for row in rows)
+    body = orders.encoded_response(200, f'{{"orders":[{documents}],"next_cursor":null}}')['body']
+    return (fetched_at - started_at) * 1000, (time.perf_counter() - fetched_at) * 1000, body
+
+
+def measure(database_url: str, way: Callable[[Any], Tuple[float, float, str]], iterations: int) -> Dict[str, Any]:
+    '''Medians over `iterations` runs after one warm-up, on a RealDictCursor like the functions use'''
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            way(cursor)
+            samples = [way(cursor) for _ in range(iterations)]
+        conn.rollback()
+    finally:
+        conn.close()
+    body = samples[-1][2]
+    if len(json.loads(body)['orders']) == 0:
+        raise RuntimeError('the page came back empty')
+    query_ms = statistics.median(sample[0] for sample in samples)
+    encode_ms = statistics.median(sample[1] for sample in samples)
+    total_ms = statistics.median(sample[0] + sample[1] for sample in samples)
+    return {'query_ms': round(query_ms, 2), 'encode_ms': round(encode_ms, 2), 'total_ms': round(total_ms, 2), 'bytes': len(body)}
+
+
+def seed(database_url: str, orders: int, items_per_order: int) -> None:
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO users (email, password_hash, full_name)
+                   SELECT 'encode' || n || '@example.com', '-', 'Customer ' || n
+                   FROM generate_series(1, 100) n"""
+            )
+            cursor.execute(
+                """INSERT INTO orders (user_id, total_amount, status, delivery_address, delivery_phone, payment_method, created_at)
+                   SELECT u.id, 1000 + n %% 5000 + 0.5, 'delivered', 'Moscow, Tverskaya street ' || n, '+7 000 000-00-00', 'card',
+                          TIMESTAMP '2023-01-01' + n * INTERVAL '1 minute'
+                   FROM generate_series(1, %s) n
+                   JOIN LATERAL (SELECT id FROM users ORDER BY id OFFSET n %% 100 LIMIT 1) u ON TRUE""",
+                (orders,)
+            )
+            cursor.execute(
+                """INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity, selected_size)
+                   SELECT o.id, p.id, p.name, p.price, 1 + line %% 3, 'M'
+                   FROM orders o
+                   CROSS JOIN generate_series(1, %s) line
+                   CROSS JOIN (SELECT id, name, price FROM products ORDER BY id LIMIT 1) p""",
+                (items_per_order,)
+            )
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE users, orders, order_items')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+'''
+Business: Query-plan regression check for the orders function - seed realistic volumes, capture the SQL its GET endpoints actually run and assert via EXPLAIN that none of it scans orders or order_items sequentially
+Args: --users, --orders, --items-per-order
+Returns: Exit code 1 when a captured statement plans a Seq Scan on a guarded table
+'''
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from bench.common import capture_statements, count_round_trips, disposable_database, load_function
+
+GUARDED_TABLES = ('orders', 'order_items')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=20_000)
+    parser.add_argument('--orders', type=int, default=300_000)
+    parser.add_argument('--items-per-order', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    with disposable_database() as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        count_round_trips()
+        seed(database_url, args.users, args.orders, args.items_per_order)
+        orders = load_function('orders')
+
+        failures = 0
+        for name, query_params in requests(orders):
+            with capture_statements() as statements:
+                response = orders.handler({'httpMethod': 'GET', 'queryStringParameters': query_params, 'headers': {}}, None)
+            if response['statusCode'] != 200:
+                print(f"FAIL {name}: answered {response['statusCode']} {response['body'][:200]}")
+                failures += 1
+                continue
+            if not statements:
+                print(f"FAIL {name}: no statement reached the database")
+                failures += 1
+            for sql, _ in statements:
+                if not sql.lstrip().upper().startswith((b'SELECT', b'WITH')):
+                    continue
+                plan = explain(database_url, sql)
+                scans = list(scan_nodes(plan))
+                bad = [f"{node} on {relation}" for node, relation, _ in scans if node == 'Seq Scan' and relation in GUARDED_TABLES]
+                used = sorted({index for _, _, index in scans if index})
+                status = 'FAIL' if bad else 'ok  '
+                print(f"{status} {name}: {', '.join(bad) if bad else 'indexes ' + ', '.join(used)}")
+                failures += bool(bad)
+    return 1 if failures else 0
+
+
+def requests(orders: Any) -> Iterator[Tuple[str, Dict[str, str]]]:
+    '''Every GET shape the admin and profile pages issue, following cursors the way clients do'''
+    first_page = json.loads(orders.handler({'httpMethod': 'GET', 'queryStringParameters': {}, 'headers': {}}, None)['body'])
+    sample = first_page['orders'][0]
+    yield 'list first page', {}
+    yield 'list next page', {'cursor': first_page['next_cursor']}
+    yield 'list by status', {'status': 'pending'}
+    yield 'list by customer', {'user_id': str(sample['user_id'])}
+    customer_page = json.loads(orders.handler(
+        {'httpMethod': 'GET', 'queryStringParameters': {'user_id': str(sample['user_id']), 'limit': '1'}, 'headers': {}}, None
+    )['body'])
+    if customer_page['next_cursor']:
+        yield 'list by customer, next page', {'user_id': str(sample['user_id']), 'cursor': customer_page['next_cursor']}
+    yield 'single order', {'order_id': str(sample['id'])}
+    yield 'export one month', {'export': 'ndjson', 'date_from': '2025-06-01', 'date_to': '2025-06-30'}
+    feed_start = json.loads(orders.handler(
+        {'httpMethod': 'GET', 'queryStringParameters': {'feed': 'orders'}, 'headers': {}}, None
+    )['body'])['cursor']
+    yield 'feed', {'feed': 'orders', 'since': feed_start, 'wait': '0'}
+
+
+def seed(database_url: str, users: int, orders: int, items_per_order: int) -> None:
+    '''Two years of orders spread over many customers, mostly delivered, with a few items each'''
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO users (email, password_hash, full_name)
+                   SELECT 'user' || n || '@example.com', '-', 'User ' || n FROM generate_series(1, %s) n""",
+                (users,)
+            )
+            cursor.execute(
+                """INSERT INTO orders (user_id, total_amount, status, delivery_address, payment_method, created_at, updated_at)
+                   SELECT u.id, 1000, s.status, 'Moscow', 'card', t.at, t.at
+                   FROM generate_series(1, %s) n
+                   CROSS JOIN LATERAL (SELECT TIMESTAMP '2024-07-01' + random() * INTERVAL '730 days' + n * INTERVAL '0 s' as at) t
+                   CROSS JOIN LATERAL (SELECT (SELECT min(id) FROM users) + floor(random() * %s)::int + n * 0 as id) u
+                   CROSS JOIN LATERAL (
+                       SELECT CASE WHEN r < 0.75 THEN 'delivered' WHEN r < 0.85 THEN 'shipped'
+                                   WHEN r < 0.9 THEN 'processing' WHEN r < 0.97 THEN 'cancelled' ELSE 'pending' END as status
+                       FROM (SELECT random() + n * 0 as r) x
+                   ) s""",
+                (orders, users)
+            )
+            cursor.execute(
+                """INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity, selected_size)
+                   SELECT o.id, p.id, p.name, p.price, 1, 'One Size'
+                   FROM orders o
+                   CROSS JOIN generate_series(1, %s) k
+                   JOIN products p ON p.id = (SELECT min(id) FROM products) + (o.id + k) %% 3""",
+                (items_per_order,)
+            )
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE')
+    finally:
+        conn.close()
+
+
+def explain(database_url: str, sql: bytes) -> Dict[str, Any]:
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(b'EXPLAIN (FORMAT JSON) ' + sql)
+            return cursor.fetchone()[0][0]['Plan']
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def scan_nodes(plan: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    if 'Relation Name' in plan or 'Index Name' in plan:
+        yield plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')
+    for child in plan.get('Plans', []):
+        yield from scan_nodes(child)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+'''
+Business: Peak-memory test of the orders export - seed a million orders, download the whole export the way the admin page does (following X-Next-Cursor chunk by chunk) and measure the largest Python heap and resident-set growth any single call needed
+Args: --orders, --format, --gzip, --max-peak-mb, --ref (repeatable; "worktree" is the checked-out code)
+Returns: Exit code 1 when the worktree export misses orders or one call's heap peak exceeds --max-peak-mb
+'''
+
+import argparse
+import base64
+import gzip
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Dict, Any, List, Optional
+
+from bench.common import disposable_database, load_function
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--gzip', action='store_true', help='send Accept-Encoding: gzip like a browser')
+    parser.add_argument('--max-peak-mb', type=float, default=64.0)
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. e3a1f0c~1; defaults to the worktree')
+    args = parser.parse_args(argv)
+    refs = args.ref or ['worktree']
+
+    failures = []
+    with disposable_database() as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        seed(database_url, args.orders)
+        print(f"{'revision':<16} {'calls':>6} {'orders':>9} {'MB sent':>9} {'seconds':>8} {'peak heap MB':>13} {'RSS growth MB':>14}")
+        context = multiprocessing.get_context('fork')
+        for ref in refs:
+            with context.Pool(1) as pool:
+                result = pool.apply(download, (ref, args.format, args.gzip))
+            print(f"{ref:<16} {result['calls']:>6} {result['orders']:>9} {result['bytes'] / 2**20:>9.1f} "
+                  f"{result['seconds']:>8.1f} {result['peak_heap'] / 2**20:>13.1f} {result['rss_growth'] / 2**20:>14.1f}")
+            if ref != 'worktree':
+                continue
+            if result['orders'] != args.orders:
+                failures.append(f"exported {result['orders']} of {args.orders} orders")
+            if result['peak_heap'] / 2**20 > args.max_peak_mb:
+                failures.append(f"one call peaked at {result['peak_heap'] / 2**20:.1f} MB of heap, above {args.max_peak_mb} MB")
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def download(ref: str, export_format: str, gzip_output: bool) -> Dict[str, Any]:
+    '''
+    Run in a fresh child process so the resident-set high-water mark belongs to this
+    revision alone. The heap peak is reset before every call and the largest one kept.
+    '''
+    module = load_function('orders', None if ref == 'worktree' else ref)
+    headers = {'Accept-Encoding': 'gzip'} if gzip_output else {}
+    module.handler({'httpMethod': 'GET', 'queryStringParameters': {'export': export_format, 'date_from': '2099-01-01'},
+                    'headers': headers}, None)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    result = {'calls': 0, 'orders': 0, 'bytes': 0, 'peak_heap': 0}
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    cursor = None
+    while True:
+        query_params = {'export': export_format, **({'cursor': cursor} if cursor else {})}
+        tracemalloc.reset_peak()
+        response = module.handler({'httpMethod': 'GET', 'queryStringParameters': query_params, 'headers': headers}, None)
+        result['peak_heap'] = max(result['peak_heap'], tracemalloc.get_traced_memory()[1])
+        if response['statusCode'] != 200:
+            raise RuntimeError(f"{ref} answered {response['statusCode']}: {response['body'][:200]}")
+        body = response['body']
+        result['bytes'] += len(body)
+        if response.get('isBase64Encoded'):
+            body = gzip.decompress(base64.b64decode(body))
+        body = body.decode('utf-8') if isinstance(body, bytes) else body
+        lines = body.count('\n')
+        result['orders'] += lines - 1 if export_format == 'csv' and not cursor else lines
+        result['calls'] += 1
+        del body, response['body']
+        cursor = response['headers'].get('X-Next-Cursor')
+        if not cursor:
+            break
+    result['seconds'] = time.perf_counter() - started_at
+    tracemalloc.stop()
+    result['rss_growth'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - rss_before
+    return result
+
+
+def seed(database_url: str, orders: int) -> None:
+    '''One item per order, so CSV lines and NDJSON lines both equal the order count'''
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO users (email, password_hash, full_name) VALUES ('export@example.com', '-', 'Export') RETURNING id"
+            )
+            user_id = cursor.fetchone()[0]
+            cursor.execute(
+                """INSERT INTO orders (user_id, total_amount, status, delivery_address, delivery_phone, payment_method, created_at)
+                   SELECT %s, 1000, 'delivered', 'Moscow, Tverskaya street ' || n, '+7 000 000-00-00', 'card',
+                          TIMESTAMP '2023-01-01' + n * INTERVAL '1 minute'
+                   FROM generate_series(1, %s) n""",
+                (user_id, orders)
+            )
+            cursor.execute(
+                """INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity, selected_size)
+                   SELECT o.id, p.id, p.name, p.price, 1, 'One Size'
+                   FROM orders o CROSS JOIN (SELECT id, name, price FROM products ORDER BY id LIMIT 1) p"""
+            )
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE orders, order_items')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+'''
+Business: Concurrency test for stock reservation - many worker processes (separate function instances with their own pools) order one hot SKU at once; proves no oversell and bounded latency
+Args: --workers, --stock, --attempts, --quantity, --max-p99-ms, --ref
+Returns: Exit code 1 on oversell, undersell, a non 200/409 answer or p99 above the bound
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+from bench.common import disposable_database, latency_summary, load_function
+
+_orders: Any = None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=200)
+    parser.add_argument('--attempts', type=int, default=20, help='orders each worker tries to place')
+    parser.add_argument('--quantity', type=int, default=1, help='units of the hot SKU per order')
+    parser.add_argument('--max-p99-ms', type=float, default=500.0)
+    parser.add_argument('--ref', help='git revision of the orders function to test instead of the worktree')
+    args = parser.parse_args(argv)
+
+    with disposable_database() as database_url:
+        product_id, user_id = seed(database_url, args.stock)
+        start_at = time.time() + 1.0
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            jobs = [
+                pool.submit(place_orders, database_url, args.ref, product_id, user_id, args.attempts, args.quantity, start_at)
+                for _ in range(args.workers)
+            ]
+            results = [outcome for job in jobs for outcome in job.result()]
+        final_stock, sold = totals(database_url, product_id)
+
+    accepted = sum(1 for status, _ in results if status == 200)
+    rejected = sum(1 for status, _ in results if status == 409)
+    unexpected = len(results) - accepted - rejected
+    latency = latency_summary([ms for _, ms in results])
+    print(f'{len(results)} orders from {args.workers} workers for {args.stock} units: '
+          f'{accepted} accepted, {rejected} out of stock, {unexpected} unexpected')
+    print(f'stock left {final_stock}, units sold {sold}, accepted units {accepted * args.quantity}')
+    print(f"latency p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, p99 {latency['p99_ms']} ms, max {latency['max_ms']} ms")
+
+    failures = []
+    if final_stock < 0 or sold != args.stock - final_stock or sold != accepted * args.quantity:
+        failures.append('stock and sold units disagree: oversold or lost a reservation')
+    demand = args.workers * args.attempts * args.quantity
+    if demand >= args.stock and final_stock >= args.quantity:
+        failures.append(f'{final_stock} units left although demand ({demand}) exceeded stock')
+    if unexpected:
+        failures.append(f'{unexpected} answers were neither 200 nor 409')
+    if latency['p99_ms'] > args.max_p99_ms:
+        failures.append(f"p99 {latency['p99_ms']} ms is above {args.max_p99_ms} ms")
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def place_orders(database_url: str, ref: Optional[str], product_id: int, user_id: int, attempts: int,
+                 quantity: int, start_at: float) -> List[Tuple[int, float]]:
+    '''One function instance: warm up on a bad request, wait for the common start, then order in a loop'''
+    global _orders
+    if _orders is None:
+        os.environ['DATABASE_URL'] = database_url
+        _orders = load_function('orders', ref)
+        _orders.handler({'httpMethod': 'PUT', 'body': '{}'}, None)
+    body = json.dumps({
+        'user_id': user_id,
+        'items': [{'id': product_id, 'name': 'Hot SKU', 'price': 125000, 'quantity': quantity, 'selectedSize': 'One Size'}],
+        'total_amount': 125000 * quantity,
+        'delivery_address': 'Bench street 1',
+        'delivery_phone': '+7 000 000-00-00'
+    })
+    time.sleep(max(0.0, start_at - time.time()))
+    outcomes = []
+    for _ in range(attempts):
+        started_at = time.perf_counter()
+        response = _orders.handler({'httpMethod': 'POST', 'headers': {}, 'body': body}, None)
+        outcomes.append((response['statusCode'], (time.perf_counter() - started_at) * 1000))
+    return outcomes
+
+
+def seed(database_url: str, stock: int) -> Tuple[int, int]:
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO products (name, price, category, sizes, stock)
+                   VALUES ('Hot SKU', 125000, 'bench', ARRAY['One Size'], %s) RETURNING id""",
+                (stock,)
+            )
+            product_id = cursor.fetchone()[0]
+            cursor.execute("INSERT INTO users (email, password_hash) VALUES ('hot-sku@example.com', '-') RETURNING id")
+            user_id = cursor.fetchone()[0]
+        conn.commit()
+    finally:
+        conn.close()
+    return product_id, user_id
+
+
+def totals(database_url: str, product_id: int) -> Tuple[int, int]:
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """SELECT p.stock, (SELECT COALESCE(sum(quantity), 0) FROM order_items WHERE product_id = p.id)
+                   FROM products p WHERE p.id = %s""",
+                (product_id,)
+            )
+            stock, sold = cursor.fetchone()
+    finally:
+        conn.close()
+    return stock, int(sold)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
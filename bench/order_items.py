@@ -0,0 +1,98 @@
+'''
+Business: Measure database round trips and latency of order creation against cart size, optionally for several git revisions of the orders function side by side
+Args: --sizes, --iterations, --ref (repeatable; "worktree" is the checked-out code)
+Returns: Table of round trips, p50 and p95 per revision and cart size
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+from bench.common import count_round_trips, disposable_database, invoke_counted, latency_summary, load_function
+
+PRODUCT_STOCK = 1_000_000_000
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1,5,10,20,40', help='comma-separated cart sizes (distinct products)')
+    parser.add_argument('--iterations', type=int, default=50, help='orders created per cart size')
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. a634230~1; defaults to the worktree')
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with disposable_database() as database_url:
+        os.environ['DATABASE_URL'] = database_url
+        count_round_trips()
+        user_id, products = seed(database_url, max(sizes))
+
+        print(f"{'revision':<16} {'items':>5} {'trips':>5} {'p50 ms':>8} {'p95 ms':>8}")
+        for ref in args.ref or ['worktree']:
+            module = load_function('orders', None if ref == 'worktree' else ref)
+            for size in sizes:
+                event = order_event(user_id, products[:size])
+                module.handler(event, None)
+                samples = []
+                trips = 0
+                for _ in range(args.iterations):
+                    started_at = time.perf_counter()
+                    response, trips = invoke_counted(module, event)
+                    samples.append((time.perf_counter() - started_at) * 1000)
+                    if response['statusCode'] != 200:
+                        print(f"{ref}: {size} items answered {response['statusCode']}: {response['body']}", file=sys.stderr)
+                        return 1
+                summary = latency_summary(samples)
+                print(f"{ref:<16} {size:>5} {trips:>5} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f}")
+    return 0
+
+
+def seed(database_url: str, count: int) -> Any:
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute(
+                "INSERT INTO users (email, password_hash, full_name) VALUES ('bench@example.com', '-', 'Bench') RETURNING id"
+            )
+            user_id = cursor.fetchone()['id']
+            cursor.execute(
+                """INSERT INTO products (name, price, category, sizes, stock)
+                   SELECT 'Bench product ' || n, 100 + n, 'bench', ARRAY['One Size'], %s
+                   FROM generate_series(1, %s) n
+                   RETURNING id, name, price""",
+                (PRODUCT_STOCK, count)
+            )
+            products = cursor.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+    return user_id, products
+
+
+def order_event(user_id: int, products: List[Dict[str, Any]]) -> Dict[str, Any]:
+    items = [
+        {'id': p['id'], 'name': p['name'], 'price': float(p['price']), 'quantity': 1, 'selectedSize': 'One Size'}
+        for p in products
+    ]
+    return {
+        'httpMethod': 'POST',
+        'headers': {},
+        'queryStringParameters': None,
+        'body': json.dumps({
+            'user_id': user_id,
+            'items': items,
+            'total_amount': sum(item['price'] for item in items),
+            'delivery_address': 'Bench street 1',
+            'delivery_phone': '+7 000 000-00-00',
+            'payment_method': 'card'
+        })
+    }
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+'''
+Business: Replay every function's tests.json scenarios against a disposable Postgres and a fake Telegram API, in-process or over a local HTTP shim, and report throughput, p50/p95/p99 and DB round trips per request
+Args: --functions, --mode inprocess|http, --concurrency, --iterations, --baseline, --update-baseline, --tolerance
+Returns: Report with each function's own pool, cache and client counters at the end of its run; exit code 1 when a scenario answers with an unexpected status or regresses past the stored baseline
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+from bench.common import (
+    FUNCTIONS, FakeTelegram, HttpShim, count_round_trips, disposable_database, invoke_counted,
+    latency_summary, load_function, load_scenarios, scenario_event
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines.json'
+# p95 differences below this many milliseconds are scheduler noise on shared runners, not regressions
+LATENCY_SLACK_MS = 5.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--mode', choices=('inprocess', 'http'), default='inprocess')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=50, help='timed requests per scenario')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='allowed p95 growth over the baseline, as a ratio')
+    args = parser.parse_args(argv)
+
+    functions = [name for name in args.functions.split(',') if name]
+    with disposable_database() as database_url, FakeTelegram() as telegram:
+        os.environ.update({
+            'DATABASE_URL': database_url,
+            'TELEGRAM_API_URL': telegram.url,
+            'TELEGRAM_BOT_TOKEN': 'bench-token',
+            'JWT_SECRET': 'bench-secret-not-for-production-use-only',
+            'BCRYPT_ROUNDS': os.environ.get('BCRYPT_ROUNDS', '4')
+        })
+        count_round_trips()
+        modules = {name: load_function(name) for name in functions}
+        with HttpShim(modules) as shim:
+            results = {name: run_function(name, modules[name], args, shim.url) for name in functions}
+
+    print_report(results)
+    failures = [
+        f"{name}: {scenario['name']} answered {scenario['status']}, expected {scenario['expected_status']}"
+        for name, result in results.items()
+        for scenario in result['scenarios']
+        if scenario['status'] != scenario['expected_status']
+    ]
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.update_baseline:
+        baselines[args.mode] = {
+            name: {s['name']: {'round_trips': s['round_trips'], 'p95_ms': s['p95_ms']} for s in result['scenarios']}
+            for name, result in results.items()
+        }
+        args.baseline.write_text(json.dumps(baselines, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+        print(f'Baseline written to {args.baseline}')
+    else:
+        failures += regressions(results, baselines.get(args.mode, {}), args.tolerance)
+
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def run_function(name: str, module: Any, args: argparse.Namespace, shim_url: str) -> Dict[str, Any]:
+    '''
+    One serial pass checks statuses and counts round trips (the counter is process-wide),
+    then every scenario is replayed `iterations` times from `concurrency` workers.
+    '''
+    scenarios = load_scenarios(name)
+    report = []
+    seen: Dict[str, int] = {}
+    for scenario in scenarios:
+        response, round_trips = invoke_counted(module, scenario_event(scenario))
+        seen[scenario['name']] = seen.get(scenario['name'], 0) + 1
+        report.append({
+            'name': scenario['name'] + (f" #{seen[scenario['name']]}" if seen[scenario['name']] > 1 else ''),
+            'expected_status': scenario.get('expectedStatus', 200),
+            'status': response['statusCode'],
+            'round_trips': round_trips
+        })
+
+    call = in_process_call(module) if args.mode == 'inprocess' else http_call(f'{shim_url}/{name}')
+    jobs = [index for index in range(len(scenarios)) for _ in range(args.iterations)]
+    samples: List[List[float]] = [[] for _ in scenarios]
+
+    def timed(index: int) -> None:
+        started_at = time.perf_counter()
+        call(scenarios[index])
+        samples[index].append((time.perf_counter() - started_at) * 1000)
+
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(timed, jobs))
+    elapsed = time.perf_counter() - started_at
+
+    for entry, scenario_samples in zip(report, samples):
+        entry.update(latency_summary(scenario_samples))
+    stats = module.runtime_stats() if hasattr(module, 'runtime_stats') else {}
+    return {'scenarios': report, 'requests': len(jobs), 'throughput_rps': round(len(jobs) / elapsed, 1), 'stats': stats}
+
+
+def in_process_call(module: Any) -> Callable[[Dict[str, Any]], int]:
+    def call(scenario: Dict[str, Any]) -> int:
+        return module.handler(scenario_event(scenario), None)['statusCode']
+    return call
+
+
+def http_call(base_url: str) -> Callable[[Dict[str, Any]], int]:
+    def call(scenario: Dict[str, Any]) -> int:
+        body = scenario.get('body')
+        request = urllib.request.Request(
+            base_url + scenario.get('path', '/'),
+            data=json.dumps(body).encode('utf-8') if body is not None else None,
+            headers={'Content-Type': 'application/json', **scenario.get('headers', {})},
+            method=scenario.get('method', 'GET')
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+    return call
+
+
+def regressions(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    failures = []
+    for name, result in results.items():
+        for scenario in result['scenarios']:
+            expected = baseline.get(name, {}).get(scenario['name'])
+            if expected is None:
+                continue
+            if scenario['round_trips'] > expected['round_trips']:
+                failures.append(
+                    f"{name}: {scenario['name']} takes {scenario['round_trips']} round trips, baseline {expected['round_trips']}"
+                )
+            limit = max(expected['p95_ms'] * (1 + tolerance), expected['p95_ms'] + LATENCY_SLACK_MS)
+            if scenario['p95_ms'] > limit:
+                failures.append(
+                    f"{name}: {scenario['name']} p95 {scenario['p95_ms']} ms, baseline {expected['p95_ms']} ms"
+                )
+    return failures
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    for name, result in results.items():
+        print(f"\n{name}: {result['requests']} requests, {result['throughput_rps']} req/s")
+        print(f"  {'scenario':<48} {'status':>6} {'trips':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for s in result['scenarios']:
+            print(f"  {s['name'][:48]:<48} {s['status']:>6} {s['round_trips']:>5} "
+                  f"{s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+        for helper, counters in result['stats'].items():
+            print(f"  {helper + ':':<15} " + ' '.join(f'{key}={format_stat(value)}' for key, value in counters.items()))
+
+
+def format_stat(value: Any) -> str:
+    return f'{value:.2f}' if isinstance(value, float) else str(value)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+'''
+Business: Seed-and-time check for product search - fill the catalog with 100k generated products, run typical queries (common and rare words, phrases, typos, category filter, deep page, no match) past the in-process cache and report latency plus the plan of the search statement
+Args: --products, --iterations, --max-p95-ms, --ref (repeatable; "worktree" is the checked-out code, a git ref also supplies that revision's migrations)
+Returns: Exit code 1 when a query answers non-200, its p95 exceeds --max-p95-ms, or the worktree search statement scans products sequentially
+'''
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from bench.common import capture_statements, count_round_trips, disposable_database, latency_summary, load_function
+
+QUERIES: List[Tuple[str, Dict[str, str]]] = [
+    ('common word', {'q': 'платье'}),
+    ('two words', {'q': 'шёлковое платье'}),
+    ('phrase', {'q': '"кожаная сумка"'}),
+    ('rare word', {'q': 'кашемировый шарф'}),
+    ('stemmed form', {'q': 'платья'}),
+    ('typo', {'q': 'кашимировый'}),
+    ('latin', {'q': 'premium'}),
+    ('category filter', {'q': 'платье', 'category': 'dresses'}),
+    ('deep page', {'q': 'платье', 'offset': '2400'}),
+    ('no match', {'q': 'экскаватор'})
+]
+
+ADJECTIVES = ['Шёлковое', 'Кожаная', 'Кашемировый', 'Льняная', 'Шерстяное', 'Бархатный', 'Хлопковая', 'Замшевые', 'Вязаный', 'Атласное']
+ITEMS = [
+    ('платье', 'dresses'), ('сумка', 'accessories'), ('шарф', 'accessories'), ('рубашка', 'shirts'), ('пальто', 'outerwear'),
+    ('пиджак', 'outerwear'), ('блуза', 'shirts'), ('туфли', 'shoes'), ('свитер', 'knitwear'), ('юбка', 'skirts')
+]
+COLLECTIONS = ['Premium', 'Classic', 'Riviera', 'Milano', 'Noir', 'Atelier', 'Heritage', 'Studio']
+COLORS = ['чёрный', 'белый', 'бежевый', 'синий', 'красный', 'зелёный', 'серый', 'бордовый']
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--iterations', type=int, default=30, help='uncached runs of each query')
+    parser.add_argument('--max-p95-ms', type=float, default=100.0)
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. 060976b~1; defaults to the worktree')
+    args = parser.parse_args(argv)
+
+    failures = []
+    for ref in args.ref or ['worktree']:
+        function_ref = None if ref == 'worktree' else ref
+        with disposable_database(ref=function_ref) as database_url:
+            os.environ['DATABASE_URL'] = database_url
+            count_round_trips()
+            seed(database_url, args.products)
+            products = load_function('products', function_ref)
+            print(f'{ref}: {args.products} products')
+            print(f"  {'query':<16} {'total':>6} {'p50 ms':>8} {'p95 ms':>8} {'sql ms':>8}  plan")
+            for label, query_params in QUERIES:
+                event = {'httpMethod': 'GET', 'queryStringParameters': {'path': '/search', **query_params}, 'headers': {}}
+                samples = []
+                for _ in range(args.iterations):
+                    products._catalog_cache.clear()
+                    started_at = time.perf_counter()
+                    response = products.handler(dict(event), None)
+                    samples.append((time.perf_counter() - started_at) * 1000)
+                if response['statusCode'] != 200:
+                    print(f"  {label:<16} answered {response['statusCode']}: {response['body'][:120]}")
+                    failures.append(f'{ref} {label}: status {response["statusCode"]}')
+                    continue
+                products._catalog_cache.clear()
+                with capture_statements() as statements:
+                    products.handler(dict(event), None)
+                sql_ms, scans = explain_search(database_url, statements)
+                latency = latency_summary(samples)
+                total = json.loads(response['body']).get('total', '-')
+                print(f"  {label:<16} {total:>6} {latency['p50_ms']:>8.2f} {latency['p95_ms']:>8.2f} {sql_ms:>8.2f}  {', '.join(scans)}")
+                if latency['p95_ms'] > args.max_p95_ms:
+                    failures.append(f"{ref} {label}: p95 {latency['p95_ms']} ms is above {args.max_p95_ms} ms")
+                if ref == 'worktree' and 'Seq Scan on products' in scans:
+                    failures.append(f'{ref} {label}: the search statement scans products sequentially')
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def explain_search(database_url: str, statements: List[Tuple[bytes, Optional[str]]]) -> Tuple[float, List[str]]:
+    '''Execution time and scan nodes of the slowest SELECT the request ran, which is the search itself'''
+    import psycopg2
+
+    slowest = (0.0, [])
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            for sql, _ in statements:
+                if not sql.lstrip().upper().startswith((b'SELECT', b'WITH')):
+                    continue
+                cursor.execute(b'EXPLAIN (ANALYZE, FORMAT JSON) ' + sql)
+                result = cursor.fetchone()[0][0]
+                scans = sorted({
+                    f"{node} on {index or relation}" for node, relation, index in scan_nodes(result['Plan'])
+                    if relation == 'products' or (index or '').startswith('idx_products')
+                })
+                slowest = max(slowest, (result['Execution Time'], scans))
+    finally:
+        conn.rollback()
+        conn.close()
+    return slowest
+
+
+def scan_nodes(plan: Dict[str, Any]) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    if 'Relation Name' in plan or 'Index Name' in plan:
+        yield plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')
+    for child in plan.get('Plans', []):
+        yield from scan_nodes(child)
+
+
+def seed(database_url: str, count: int) -> None:
+    '''
+    Names combine an adjective, an item, a collection and a color, so common words
+    match thousands of products and rare combinations a few; descriptions add text
+    that only the full-text index sees
+    '''
+    import psycopg2
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """INSERT INTO products (name, description, price, category, sizes, stock)
+                   SELECT a.word || ' ' || i.word || ' ' || c.word || ', ' || k.word,
+                          'Модель ' || n || ' из коллекции ' || c.word || '. Натуральные материалы, ручная отделка.',
+                          1000 + (n %% 500) * 100, i.category, ARRAY['S', 'M', 'L'], 10
+                   FROM generate_series(1, %(count)s) n
+                   CROSS JOIN LATERAL (SELECT (%(adjectives)s::text[])[1 + (n * 7) %% %(adjective_count)s] as word) a
+                   CROSS JOIN LATERAL (
+                       SELECT (%(items)s::text[])[1 + (n * 3) %% %(item_count)s] as word,
+                              (%(categories)s::text[])[1 + (n * 3) %% %(item_count)s] as category
+                   ) i
+                   CROSS JOIN LATERAL (SELECT (%(collections)s::text[])[1 + (n * 11) %% %(collection_count)s] as word) c
+                   CROSS JOIN LATERAL (SELECT (%(colors)s::text[])[1 + (n * 13) %% %(color_count)s] as word) k""",
+                {
+                    'count': count,
+                    'adjectives': ADJECTIVES, 'adjective_count': len(ADJECTIVES),
+                    'items': [word for word, _ in ITEMS], 'categories': [category for _, category in ITEMS], 'item_count': len(ITEMS),
+                    'collections': COLLECTIONS, 'collection_count': len(COLLECTIONS),
+                    'colors': COLORS, 'color_count': len(COLORS)
+                }
+            )
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('VACUUM ANALYZE products')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+'''
+Business: Cold-start check for every function - import backend/<name>/index.py in a fresh interpreter, answer one CORS preflight and report import time, the function's own INIT_MS and which heavy dependencies got loaded
+Args: --functions, --runs, --ref (repeatable; "worktree" is the checked-out code), --baseline, --update-baseline, --tolerance
+Returns: Exit code 1 when a worktree preflight loads a heavy dependency or a worktree import grows past the stored baseline
+'''
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from bench.common import FUNCTIONS, REPO_ROOT, function_path
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baselines.json'
+BASELINE_KEY = 'startup'
+IMPORT_SLACK_MS = 5.0
+
+PROBE = '''
+import importlib.util, json, sys, time
+heavy = ('psycopg2', 'jwt', 'bcrypt', 'requests')
+started_at = time.perf_counter()
+spec = importlib.util.spec_from_file_location('index', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+import_ms = (time.perf_counter() - started_at) * 1000
+on_import = [name for name in heavy if name in sys.modules]
+started_at = time.perf_counter()
+status = module.handler({'httpMethod': 'OPTIONS', 'headers': {}}, None)['statusCode']
+preflight_ms = (time.perf_counter() - started_at) * 1000
+print(json.dumps({
+    'import_ms': import_ms,
+    'init_ms': getattr(module, 'INIT_MS', None),
+    'preflight_ms': preflight_ms,
+    'preflight_status': status,
+    'on_import': on_import,
+    'on_preflight': [name for name in heavy if name in sys.modules and name not in on_import]
+}))
+'''
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--functions', nargs='+', default=list(FUNCTIONS), choices=FUNCTIONS)
+    parser.add_argument('--runs', type=int, default=20, help='fresh interpreters per function and revision')
+    parser.add_argument('--ref', action='append', help='git revision to compare, e.g. a077726~1; defaults to the worktree')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=1.0, help='allowed import time growth over the baseline, as a ratio')
+    args = parser.parse_args(argv)
+    refs = args.ref or ['worktree']
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline = baselines.get(BASELINE_KEY, {})
+    results: Dict[str, Dict[str, Any]] = {}
+    failures = []
+    print(f"{'function':<13} {'revision':<16} {'import ms':>10} {'init ms':>8} {'preflight ms':>13} {'process ms':>11}  heavy imports")
+    for name in args.functions:
+        for ref in refs:
+            try:
+                path = function_path(name, None if ref == 'worktree' else ref)
+            except FileNotFoundError:
+                print(f'{name:<13} {ref:<16} {"-":>10}')
+                continue
+            result = measure(path, args.runs)
+            heavy = ', '.join(
+                [f'{module} (import)' for module in result['on_import']]
+                + [f'{module} (preflight)' for module in result['on_preflight']]
+            ) or '-'
+            init_ms = '-' if result['init_ms'] is None else f"{result['init_ms']:.2f}"
+            print(f"{name:<13} {ref:<16} {result['import_ms']:>10.2f} {init_ms:>8} "
+                  f"{result['preflight_ms']:>13.3f} {result['process_ms']:>11.1f}  {heavy}")
+            if ref != 'worktree':
+                continue
+            results[name] = result
+            if result['preflight_status'] != 200:
+                failures.append(f"{name}: preflight answered {result['preflight_status']}")
+            if result['on_import'] or result['on_preflight']:
+                failures.append(f'{name}: a cold preflight loads {heavy}')
+            expected = baseline.get(name)
+            if expected is not None and not args.update_baseline:
+                limit = max(expected['import_ms'] * (1 + args.tolerance), expected['import_ms'] + IMPORT_SLACK_MS)
+                if result['import_ms'] > limit:
+                    failures.append(f"{name}: import takes {result['import_ms']} ms, baseline {expected['import_ms']} ms")
+
+    if args.update_baseline and results:
+        baselines[BASELINE_KEY] = {
+            **baseline,
+            **{name: {'import_ms': result['import_ms'], 'init_ms': result['init_ms']} for name, result in results.items()}
+        }
+        args.baseline.write_text(json.dumps(baselines, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+        print(f'Baseline written to {args.baseline}')
+
+    for failure in failures:
+        print(f'FAIL {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+def measure(path: Path, runs: int) -> Dict[str, Any]:
+    '''
+    Medians over `runs` fresh interpreters after one unmeasured run, which writes the
+    bytecode cache the way the first invocation of a deployed container does
+    '''
+    samples = []
+    for _ in range(runs + 1):
+        started_at = time.perf_counter()
+        probe = subprocess.run(
+            [sys.executable, '-c', PROBE, str(path)], cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        process_ms = (time.perf_counter() - started_at) * 1000
+        if probe.returncode != 0:
+            raise RuntimeError(f'importing {path} failed:\n{probe.stderr}')
+        samples.append({**json.loads(probe.stdout.splitlines()[-1]), 'process_ms': process_ms})
+    samples = samples[1:]
+    return {
+        **samples[-1],
+        **{
+            key: round(statistics.median(sample[key] for sample in samples), 3)
+            for key in ('import_ms', 'init_ms', 'preflight_ms', 'process_ms')
+            if samples[-1][key] is not None
+        }
+    }
+
+
+if __name__ == '__main__':
+    sys.exit(main())
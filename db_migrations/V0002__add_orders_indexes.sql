@@ -0,0 +1,11 @@
+-- Speed up item aggregation for an order
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items (order_id);
+
+-- Keyset pagination over the admin order listing
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id ON orders (created_at DESC, id DESC);
+
+-- Keyset pagination over a single customer's orders
+CREATE INDEX IF NOT EXISTS idx_orders_user_id_created_at_id ON orders (user_id, created_at DESC, id DESC);
+
+-- Status-filtered admin listings
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at_id ON orders (status, created_at DESC, id DESC);
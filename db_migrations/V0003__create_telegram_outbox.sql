@@ -0,0 +1,15 @@
+-- Create outbox for Telegram notifications, drained asynchronously by the telegram function
+CREATE TABLE IF NOT EXISTS telegram_outbox (
+    id SERIAL PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    order_id INTEGER REFERENCES orders(id),
+    text TEXT,
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    sent_at TIMESTAMP,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Pending messages in the order the drain worker picks them
+CREATE INDEX IF NOT EXISTS idx_telegram_outbox_pending ON telegram_outbox (next_attempt_at, id) WHERE sent_at IS NULL;
@@ -0,0 +1,12 @@
+-- Keep products.updated_at current so the catalog version changes on every edit
+CREATE OR REPLACE FUNCTION touch_products_updated_at() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS products_touch_updated_at ON products;
+CREATE TRIGGER products_touch_updated_at
+    BEFORE UPDATE ON products
+    FOR EACH ROW EXECUTE FUNCTION touch_products_updated_at();
@@ -0,0 +1,121 @@
+-- Create daily order counts and revenue per status
+CREATE TABLE IF NOT EXISTS sales_daily_orders (
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    orders_count INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status)
+);
+
+-- Create daily units and revenue per product and status
+CREATE TABLE IF NOT EXISTS sales_daily_products (
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    status VARCHAR(50) NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, product_id, status)
+);
+
+-- Count new orders once per statement
+CREATE OR REPLACE FUNCTION rollup_inserted_orders() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sales_daily_orders (day, status, orders_count, revenue)
+    SELECT created_at::date, COALESCE(status, 'pending'), count(*), sum(total_amount)
+    FROM new_orders
+    GROUP BY 1, 2
+    ON CONFLICT (day, status) DO UPDATE
+    SET orders_count = sales_daily_orders.orders_count + EXCLUDED.orders_count,
+        revenue = sales_daily_orders.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_rollup_insert ON orders;
+CREATE TRIGGER orders_rollup_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_inserted_orders();
+
+-- Count new order lines under their order's day and status
+CREATE OR REPLACE FUNCTION rollup_inserted_order_items() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sales_daily_products (day, product_id, status, quantity, revenue)
+    SELECT o.created_at::date, ni.product_id, COALESCE(o.status, 'pending'),
+           sum(ni.quantity), sum(ni.product_price * ni.quantity)
+    FROM new_items ni
+    JOIN orders o ON o.id = ni.order_id
+    WHERE ni.product_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, product_id, status) DO UPDATE
+    SET quantity = sales_daily_products.quantity + EXCLUDED.quantity,
+        revenue = sales_daily_products.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS order_items_rollup_insert ON order_items;
+CREATE TRIGGER order_items_rollup_insert
+    AFTER INSERT ON order_items
+    REFERENCING NEW TABLE AS new_items
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_inserted_order_items();
+
+-- Move orders and their lines between status buckets when the status changes
+CREATE OR REPLACE FUNCTION rollup_updated_orders() RETURNS TRIGGER AS $$
+BEGIN
+    WITH moves AS (
+        SELECT n.created_at::date as day, v.status, v.delta, n.total_amount
+        FROM new_orders n
+        JOIN old_orders o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (COALESCE(o.status, 'pending'), -1), (COALESCE(n.status, 'pending'), 1)) AS v(status, delta)
+        WHERE o.status IS DISTINCT FROM n.status
+    )
+    INSERT INTO sales_daily_orders (day, status, orders_count, revenue)
+    SELECT day, status, sum(delta), sum(delta * total_amount)
+    FROM moves
+    GROUP BY 1, 2
+    ON CONFLICT (day, status) DO UPDATE
+    SET orders_count = sales_daily_orders.orders_count + EXCLUDED.orders_count,
+        revenue = sales_daily_orders.revenue + EXCLUDED.revenue;
+    
+    WITH moves AS (
+        SELECT n.id, n.created_at::date as day, v.status, v.delta
+        FROM new_orders n
+        JOIN old_orders o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (COALESCE(o.status, 'pending'), -1), (COALESCE(n.status, 'pending'), 1)) AS v(status, delta)
+        WHERE o.status IS DISTINCT FROM n.status
+    )
+    INSERT INTO sales_daily_products (day, product_id, status, quantity, revenue)
+    SELECT m.day, oi.product_id, m.status, sum(m.delta * oi.quantity), sum(m.delta * oi.product_price * oi.quantity)
+    FROM moves m
+    JOIN order_items oi ON oi.order_id = m.id
+    WHERE oi.product_id IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, product_id, status) DO UPDATE
+    SET quantity = sales_daily_products.quantity + EXCLUDED.quantity,
+        revenue = sales_daily_products.revenue + EXCLUDED.revenue;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_rollup_update ON orders;
+CREATE TRIGGER orders_rollup_update
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_orders NEW TABLE AS new_orders
+    FOR EACH STATEMENT EXECUTE FUNCTION rollup_updated_orders();
+
+-- Backfill rollups from existing orders
+INSERT INTO sales_daily_orders (day, status, orders_count, revenue)
+SELECT created_at::date, COALESCE(status, 'pending'), count(*), sum(total_amount)
+FROM orders
+GROUP BY 1, 2
+ON CONFLICT (day, status) DO NOTHING;
+
+-- Backfill product rollups from existing order lines
+INSERT INTO sales_daily_products (day, product_id, status, quantity, revenue)
+SELECT o.created_at::date, oi.product_id, COALESCE(o.status, 'pending'), sum(oi.quantity), sum(oi.product_price * oi.quantity)
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE oi.product_id IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (day, product_id, status) DO NOTHING;
@@ -0,0 +1,8 @@
+-- Create claimed Telegram update ids so redelivered webhook updates are handled once
+CREATE TABLE IF NOT EXISTS telegram_updates (
+    update_id BIGINT PRIMARY KEY,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Expired update cleanup
+CREATE INDEX IF NOT EXISTS idx_telegram_updates_received_at ON telegram_updates (received_at);
@@ -0,0 +1,11 @@
+-- Create shared token buckets for login attempts per email and per source IP
+CREATE TABLE IF NOT EXISTS login_rate_limits (
+    key VARCHAR(320) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    capacity DOUBLE PRECISION NOT NULL,
+    refill_per_second DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Idle bucket cleanup
+CREATE INDEX IF NOT EXISTS idx_login_rate_limits_updated_at ON login_rate_limits (updated_at);
@@ -0,0 +1,15 @@
+-- Enable trigram matching for typo-tolerant search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Add weighted full-text document; the russian configuration stems Cyrillic words and uses the English stemmer for Latin ones
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+) STORED;
+
+-- Full-text index
+CREATE INDEX IF NOT EXISTS idx_products_search_vector ON products USING GIN (search_vector);
+
+-- Trigram index on product names for misspelled queries
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products USING GIN (name gin_trgm_ops);
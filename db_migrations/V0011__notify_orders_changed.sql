@@ -0,0 +1,15 @@
+-- Keyset scan of recently changed orders for the admin feed
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at_id ON orders (updated_at, id);
+
+-- Wake admin feed listeners when an order is created or its status changes; identical payloads are folded into one notification per transaction
+CREATE OR REPLACE FUNCTION notify_orders_changed() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('orders_changed', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS orders_notify_changed ON orders;
+CREATE TRIGGER orders_notify_changed
+    AFTER INSERT OR UPDATE OF status ON orders
+    FOR EACH ROW EXECUTE FUNCTION notify_orders_changed();
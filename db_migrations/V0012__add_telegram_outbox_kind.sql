@@ -0,0 +1,5 @@
+-- Tell new-order notifications from status changes; only delivered new-order rows set orders.telegram_notified
+ALTER TABLE telegram_outbox ADD COLUMN IF NOT EXISTS kind VARCHAR(20) NOT NULL DEFAULT 'new_order';
+
+-- Status-change rows queued before this migration always carry the rendered new status
+UPDATE telegram_outbox SET kind = 'status_change' WHERE text LIKE '%Новый статус:%';
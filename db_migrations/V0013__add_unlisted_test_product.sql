@@ -0,0 +1,7 @@
+-- Products can be kept orderable but hidden from the catalog, search and favorites
+ALTER TABLE products ADD COLUMN IF NOT EXISTS listed BOOLEAN NOT NULL DEFAULT TRUE;
+
+-- Unlisted product with effectively unlimited stock for the orders tests.json scenarios, so repeated runs never drain real stock; the fixed id sits far above the serial range
+INSERT INTO products (id, name, description, price, category, sizes, stock, listed)
+VALUES (900000001, 'Тестовый товар', 'Служебный товар для автотестов заказов', 1000.00, 'test', ARRAY['M', 'L', 'One Size'], 2000000000, FALSE)
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,119 @@
+-- Append-only daily order deltas; checkouts insert here instead of upserting the shared (day, status) row, which serialized every order of the day on one row lock
+CREATE TABLE IF NOT EXISTS sales_daily_orders_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    orders_count INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL
+);
+
+-- Append-only daily product deltas, same reason
+CREATE TABLE IF NOT EXISTS sales_daily_products_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    day DATE NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    status VARCHAR(50) NOT NULL,
+    quantity INTEGER NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL
+);
+
+-- The sales summary adds unfolded deltas of its date range to the rollups
+CREATE INDEX IF NOT EXISTS idx_sales_daily_orders_deltas_day ON sales_daily_orders_deltas (day);
+CREATE INDEX IF NOT EXISTS idx_sales_daily_products_deltas_day ON sales_daily_products_deltas (day);
+
+-- Record new orders as deltas
+CREATE OR REPLACE FUNCTION rollup_inserted_orders() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sales_daily_orders_deltas (day, status, orders_count, revenue)
+    SELECT created_at::date, COALESCE(status, 'pending'), count(*), sum(total_amount)
+    FROM new_orders
+    GROUP BY 1, 2;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Record new order lines as deltas under their order's day and status
+CREATE OR REPLACE FUNCTION rollup_inserted_order_items() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO sales_daily_products_deltas (day, product_id, status, quantity, revenue)
+    SELECT o.created_at::date, ni.product_id, COALESCE(o.status, 'pending'),
+           sum(ni.quantity), sum(ni.product_price * ni.quantity)
+    FROM new_items ni
+    JOIN orders o ON o.id = ni.order_id
+    WHERE ni.product_id IS NOT NULL
+    GROUP BY 1, 2, 3;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Record status moves as a minus delta on the old bucket and a plus delta on the new one
+CREATE OR REPLACE FUNCTION rollup_updated_orders() RETURNS TRIGGER AS $$
+BEGIN
+    WITH moves AS (
+        SELECT n.created_at::date as day, v.status, v.delta, n.total_amount
+        FROM new_orders n
+        JOIN old_orders o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (COALESCE(o.status, 'pending'), -1), (COALESCE(n.status, 'pending'), 1)) AS v(status, delta)
+        WHERE o.status IS DISTINCT FROM n.status
+    )
+    INSERT INTO sales_daily_orders_deltas (day, status, orders_count, revenue)
+    SELECT day, status, sum(delta), sum(delta * total_amount)
+    FROM moves
+    GROUP BY 1, 2;
+    
+    WITH moves AS (
+        SELECT n.id, n.created_at::date as day, v.status, v.delta
+        FROM new_orders n
+        JOIN old_orders o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (COALESCE(o.status, 'pending'), -1), (COALESCE(n.status, 'pending'), 1)) AS v(status, delta)
+        WHERE o.status IS DISTINCT FROM n.status
+    )
+    INSERT INTO sales_daily_products_deltas (day, product_id, status, quantity, revenue)
+    SELECT m.day, oi.product_id, m.status, sum(m.delta * oi.quantity), sum(m.delta * oi.product_price * oi.quantity)
+    FROM moves m
+    JOIN order_items oi ON oi.order_id = m.id
+    WHERE oi.product_id IS NOT NULL
+    GROUP BY 1, 2, 3;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move accumulated deltas into the rollups; one folder at a time, others return at once. Returns the number of deltas folded
+CREATE OR REPLACE FUNCTION fold_sales_deltas() RETURNS INTEGER AS $$
+DECLARE
+    folded INTEGER := 0;
+    moved INTEGER;
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('fold_sales_deltas')) THEN
+        RETURN 0;
+    END IF;
+    
+    WITH moved AS (
+        DELETE FROM sales_daily_orders_deltas RETURNING day, status, orders_count, revenue
+    ), grouped AS (
+        INSERT INTO sales_daily_orders (day, status, orders_count, revenue)
+        SELECT day, status, sum(orders_count), sum(revenue)
+        FROM moved
+        GROUP BY 1, 2
+        ON CONFLICT (day, status) DO UPDATE
+        SET orders_count = sales_daily_orders.orders_count + EXCLUDED.orders_count,
+            revenue = sales_daily_orders.revenue + EXCLUDED.revenue
+    )
+    SELECT count(*) INTO moved FROM moved;
+    folded := folded + moved;
+    
+    WITH moved AS (
+        DELETE FROM sales_daily_products_deltas RETURNING day, product_id, status, quantity, revenue
+    ), grouped AS (
+        INSERT INTO sales_daily_products (day, product_id, status, quantity, revenue)
+        SELECT day, product_id, status, sum(quantity), sum(revenue)
+        FROM moved
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, product_id, status) DO UPDATE
+        SET quantity = sales_daily_products.quantity + EXCLUDED.quantity,
+            revenue = sales_daily_products.revenue + EXCLUDED.revenue
+    )
+    SELECT count(*) INTO moved FROM moved;
+    RETURN folded + moved;
+END;
+$$ LANGUAGE plpgsql;
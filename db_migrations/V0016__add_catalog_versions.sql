@@ -0,0 +1,31 @@
+-- Catalog version counters; the catalog cache compares their sum instead of scanning products. Spread over slots so concurrent checkouts, which all write products, rarely wait on the same row
+CREATE TABLE IF NOT EXISTS catalog_versions (
+    slot SMALLINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+-- Sixteen slots
+INSERT INTO catalog_versions (slot)
+SELECT generate_series(0, 15)
+ON CONFLICT (slot) DO NOTHING;
+
+-- Bump the writing transaction's slot. The counter becomes visible when that transaction commits, so a reader that saw the old version re-checks after a late commit instead of caching stale rows under the new one. A transaction keeps one slot for all its statements and takes it before any product row lock, so slot waits cannot deadlock
+CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE catalog_versions SET version = version + 1
+    WHERE slot = (pg_current_xact_id()::text::bigint % 16);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Once per statement that can change what the catalog shows
+DROP TRIGGER IF EXISTS products_bump_catalog_version ON products;
+CREATE TRIGGER products_bump_catalog_version
+    BEFORE INSERT OR UPDATE OR DELETE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
+
+-- TRUNCATE empties the catalog as well
+DROP TRIGGER IF EXISTS products_truncate_bump_catalog_version ON products;
+CREATE TRIGGER products_truncate_bump_catalog_version
+    BEFORE TRUNCATE ON products
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version();
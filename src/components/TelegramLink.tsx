@@ -34,7 +34,7 @@ export const TelegramLink = () => {
         description: 'Теперь вы будете получать уведомления о заказах' 
       });
       
-      const updatedUser = { ...user, telegram_id: parseInt(telegramId), telegram_username: telegramUsername };
+      const updatedUser = await authApi.verify(true);
       localStorage.setItem('user', JSON.stringify(updatedUser));
       window.location.reload();
     } catch (error) {
@@ -11,9 +11,36 @@ export interface User {
 
 export interface AuthResponse {
   token: string;
+  refresh_token: string;
+  expires_in: number;
   user: User;
 }
 
+const storeSession = (data: { token: string; refresh_token: string }) => {
+  localStorage.setItem('auth_token', data.token);
+  localStorage.setItem('refresh_token', data.refresh_token);
+};
+
+let refreshInFlight: Promise<boolean> | null = null;
+
+const rotateRefreshToken = async (seenToken: string | null): Promise<boolean> => {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) return false;
+  // Another tab rotated the token while this one waited for the lock
+  if (refreshToken !== seenToken) return true;
+  
+  const response = await fetch(`${AUTH_URL}?path=/refresh`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ refresh_token: refreshToken })
+  });
+  
+  if (!response.ok) return false;
+  
+  storeSession(await response.json());
+  return true;
+};
+
 export const authApi = {
   async register(email: string, password: string, full_name: string, phone: string): Promise<AuthResponse> {
     const response = await fetch(`${AUTH_URL}?path=/register`, {
@@ -28,7 +55,7 @@ export const authApi = {
     }
     
     const data = await response.json();
-    localStorage.setItem('auth_token', data.token);
+    storeSession(data);
     localStorage.setItem('user', JSON.stringify(data.user));
     return data;
   },
@@ -46,20 +73,27 @@ export const authApi = {
     }
     
     const data = await response.json();
-    localStorage.setItem('auth_token', data.token);
+    storeSession(data);
     localStorage.setItem('user', JSON.stringify(data.user));
     return data;
   },
 
-  async verify(): Promise<User> {
+  async verify(fresh = false, retried = false): Promise<User> {
     const token = localStorage.getItem('auth_token');
     if (!token) throw new Error('No token');
     
+    const headers: Record<string, string> = { 'X-Auth-Token': token };
+    if (fresh) headers['Cache-Control'] = 'no-cache';
+    
     const response = await fetch(`${AUTH_URL}?path=/verify`, {
       method: 'GET',
-      headers: { 'X-Auth-Token': token }
+      headers
     });
     
+    if (response.status === 401 && !retried && await this.refresh()) {
+      return this.verify(fresh, true);
+    }
+    
     if (!response.ok) {
       this.logout();
       throw new Error('Token invalid');
@@ -69,8 +103,31 @@ export const authApi = {
     return data.user;
   },
 
+  refresh(): Promise<boolean> {
+    // Single flight within the tab, and across tabs through a Web Lock: presenting a
+    // token another tab has just rotated looks like reuse and revokes the whole family
+    if (!refreshInFlight) {
+      const seenToken = localStorage.getItem('refresh_token');
+      const rotate = () => rotateRefreshToken(seenToken);
+      refreshInFlight = ('locks' in navigator ? navigator.locks.request('auth-refresh', rotate) : rotate())
+        .finally(() => { refreshInFlight = null; });
+    }
+    return refreshInFlight;
+  },
+
   logout() {
+    const token = localStorage.getItem('auth_token');
+    const refreshToken = localStorage.getItem('refresh_token');
+    if (token || refreshToken) {
+      fetch(`${AUTH_URL}?path=/logout`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...(token ? { 'X-Auth-Token': token } : {}) },
+        body: JSON.stringify({ refresh_token: refreshToken }),
+        keepalive: true
+      }).catch(() => {});
+    }
     localStorage.removeItem('auth_token');
+    localStorage.removeItem('refresh_token');
     localStorage.removeItem('user');
   },
 
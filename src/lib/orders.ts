@@ -20,27 +20,148 @@ export interface Order {
   created_at?: string;
 }
 
+export interface OrdersPage {
+  orders: Order[];
+  next_cursor: string | null;
+}
+
+export interface OrderFeed {
+  orders: Order[];
+  cursor: string;
+}
+
+export interface OrdersQuery {
+  userId?: number;
+  status?: string;
+  dateFrom?: string;
+  dateTo?: string;
+  cursor?: string | null;
+  limit?: number;
+}
+
+export interface SalesBucket {
+  orders?: number;
+  quantity?: number;
+  revenue: number;
+}
+
+export interface SalesSummary {
+  date_from: string;
+  date_to: string;
+  by_day: (SalesBucket & { day: string })[];
+  by_status: (SalesBucket & { status: string })[];
+  by_category: (SalesBucket & { category: string | null })[];
+  by_product: (SalesBucket & { product_id: number; name: string; category: string | null })[];
+}
+
+const CREATE_ORDER_RETRY_DELAYS_MS = [500, 1500, 3000];
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
 export const ordersApi = {
-  async createOrder(order: Order): Promise<{ order_id: number; created_at: string; status: string }> {
-    const response = await fetch(ORDERS_URL, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(order)
-    });
+  async createOrder(
+    order: Order,
+    idempotencyKey: string
+  ): Promise<{ order_id: number; created_at: string; total_amount: number; status: string }> {
+    // Retries reuse the caller's key, so a request that reached the server before the
+    // connection dropped is replayed instead of creating a second order
+    for (let attempt = 0; ; attempt++) {
+      const canRetry = attempt < CREATE_ORDER_RETRY_DELAYS_MS.length;
+      let response: Response;
+      try {
+        response = await fetch(ORDERS_URL, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
+          body: JSON.stringify(order)
+        });
+      } catch (error) {
+        if (!canRetry) throw error;
+        await sleep(CREATE_ORDER_RETRY_DELAYS_MS[attempt]);
+        continue;
+      }
+      
+      const inProgress = response.status === 409 && response.headers.has('Retry-After');
+      if ((response.status >= 500 || inProgress) && canRetry) {
+        const retryAfterMs = Number(response.headers.get('Retry-After')) * 1000 || 0;
+        await sleep(Math.max(retryAfterMs, CREATE_ORDER_RETRY_DELAYS_MS[attempt]));
+        continue;
+      }
+      
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.error || 'Failed to create order');
+      }
+      
+      return await response.json();
+    }
+  },
+
+  async getOrders(query: OrdersQuery = {}): Promise<OrdersPage> {
+    const params = new URLSearchParams();
+    if (query.userId) params.set('user_id', String(query.userId));
+    if (query.status) params.set('status', query.status);
+    if (query.dateFrom) params.set('date_from', query.dateFrom);
+    if (query.dateTo) params.set('date_to', query.dateTo);
+    if (query.cursor) params.set('cursor', query.cursor);
+    if (query.limit) params.set('limit', String(query.limit));
+    
+    const qs = params.toString();
+    const response = await fetch(qs ? `${ORDERS_URL}?${qs}` : ORDERS_URL);
+    
+    if (!response.ok) {
+      throw new Error('Failed to fetch orders');
+    }
+    
+    return await response.json();
+  },
+
+  async exportOrders(format: 'csv' | 'ndjson', query: OrdersQuery = {}): Promise<Blob> {
+    const params = new URLSearchParams({ export: format });
+    if (query.userId) params.set('user_id', String(query.userId));
+    if (query.status) params.set('status', query.status);
+    if (query.dateFrom) params.set('date_from', query.dateFrom);
+    if (query.dateTo) params.set('date_to', query.dateTo);
+    
+    // The server answers one bounded chunk per call; follow X-Next-Cursor until the end
+    const chunks: Blob[] = [];
+    let cursor: string | null = null;
+    do {
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`${ORDERS_URL}?${params.toString()}`);
+      
+      if (!response.ok) {
+        throw new Error('Failed to export orders');
+      }
+      
+      chunks.push(await response.blob());
+      cursor = response.headers.get('X-Next-Cursor');
+    } while (cursor);
+    
+    return new Blob(chunks, { type: chunks[0].type });
+  },
+
+  async getSalesSummary(dateFrom?: string, dateTo?: string): Promise<SalesSummary> {
+    const params = new URLSearchParams({ summary: 'sales' });
+    if (dateFrom) params.set('date_from', dateFrom);
+    if (dateTo) params.set('date_to', dateTo);
+    
+    const response = await fetch(`${ORDERS_URL}?${params.toString()}`);
     
     if (!response.ok) {
-      throw new Error('Failed to create order');
+      throw new Error('Failed to fetch sales summary');
     }
     
     return await response.json();
   },
 
-  async getOrders(userId?: number): Promise<Order[]> {
-    const url = userId ? `${ORDERS_URL}?user_id=${userId}` : ORDERS_URL;
-    const response = await fetch(url);
+  async getOrderFeed(since?: string, signal?: AbortSignal): Promise<OrderFeed> {
+    const params = new URLSearchParams({ feed: 'orders' });
+    if (since) params.set('since', since);
+    
+    const response = await fetch(`${ORDERS_URL}?${params.toString()}`, { signal });
     
     if (!response.ok) {
-      throw new Error('Failed to fetch orders');
+      throw new Error('Failed to fetch order feed');
     }
     
     return await response.json();
@@ -66,5 +187,19 @@ export const ordersApi = {
     if (!response.ok) {
       throw new Error('Failed to update order status');
     }
+  },
+
+  async updateOrdersStatus(orderIds: number[], status: string): Promise<{ orders: Order[]; not_found: number[] }> {
+    const response = await fetch(ORDERS_URL, {
+      method: 'PUT',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ order_ids: orderIds, status })
+    });
+    
+    if (!response.ok) {
+      throw new Error('Failed to update orders status');
+    }
+    
+    return await response.json();
   }
 };
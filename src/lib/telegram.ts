@@ -33,5 +33,13 @@ export const telegramApi = {
     if (!response.ok) {
       throw new Error('Failed to send notification');
     }
+    
+    telegramApi.drainOutbox();
+  },
+
+  drainOutbox(): void {
+    // Queued notifications go out when someone drains the outbox; kick it right after enqueueing
+    // and let the scheduled drain pick up anything that fails here or needs a retry
+    fetch(`${TELEGRAM_API_URL}?path=/drain-outbox`, { method: 'POST', keepalive: true }).catch(() => undefined);
   }
 };
@@ -5,14 +5,18 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { authApi, User } from '@/lib/auth';
-import { ordersApi, Order } from '@/lib/orders';
+import { ordersApi, Order, SalesSummary } from '@/lib/orders';
+import { telegramApi } from '@/lib/telegram';
 import Icon from '@/components/ui/icon';
 import { useToast } from '@/hooks/use-toast';
 
 const Admin = () => {
   const [user, setUser] = useState<User | null>(null);
   const [orders, setOrders] = useState<Order[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [summary, setSummary] = useState<SalesSummary | null>(null);
   const [loading, setLoading] = useState(true);
+  const [feedStart, setFeedStart] = useState<string | null>(null);
   const navigate = useNavigate();
   const { toast } = useToast();
 
@@ -20,6 +24,27 @@ const Admin = () => {
     checkAuth();
   }, []);
 
+  useEffect(() => {
+    if (feedStart === null) return;
+    
+    const controller = new AbortController();
+    const follow = async () => {
+      let cursor = feedStart || undefined;
+      while (!controller.signal.aborted) {
+        try {
+          const feed = await ordersApi.getOrderFeed(cursor, controller.signal);
+          if (feed.orders.length) mergeOrders(feed.orders);
+          cursor = feed.cursor;
+        } catch {
+          if (controller.signal.aborted) return;
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+    };
+    follow();
+    return () => controller.abort();
+  }, [feedStart]);
+
   const checkAuth = async () => {
     try {
       const currentUser = await authApi.verify();
@@ -31,7 +56,11 @@ const Admin = () => {
         return;
       }
       
-      await loadOrders();
+      // Take the feed position before the first page, so an order committed in
+      // between arrives through the feed; merging by id absorbs the overlap
+      const feed = await ordersApi.getOrderFeed().catch(() => null);
+      await Promise.all([loadOrders(), loadSummary()]);
+      setFeedStart(feed?.cursor ?? '');
     } catch {
       navigate('/');
     } finally {
@@ -39,20 +68,53 @@ const Admin = () => {
     }
   };
 
-  const loadOrders = async () => {
+  const loadOrders = async (cursor?: string) => {
     try {
-      const data = await ordersApi.getOrders();
-      setOrders(data);
+      const data = await ordersApi.getOrders({ cursor });
+      setOrders(cursor ? [...orders, ...data.orders] : data.orders);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       toast({ title: 'Ошибка загрузки заказов', variant: 'destructive' });
     }
   };
 
+  const mergeOrders = (changed: Order[]) => {
+    setOrders((current) => {
+      const byId = new Map(changed.map((order) => [order.id, order]));
+      const updated = current.map((order) => byId.get(order.id) ?? order);
+      const known = new Set(current.map((order) => order.id));
+      const created = changed.filter((order) => !known.has(order.id)).reverse();
+      return [...created, ...updated];
+    });
+  };
+
+  const loadSummary = async () => {
+    try {
+      setSummary(await ordersApi.getSalesSummary());
+    } catch (error) {
+      toast({ title: 'Ошибка загрузки статистики', variant: 'destructive' });
+    }
+  };
+
+  const exportOrders = async (format: 'csv' | 'ndjson') => {
+    try {
+      const blob = await ordersApi.exportOrders(format);
+      const url = URL.createObjectURL(blob);
+      const link = document.createElement('a');
+      link.href = url;
+      link.download = `orders.${format}`;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      toast({ title: 'Ошибка выгрузки заказов', variant: 'destructive' });
+    }
+  };
+
   const updateStatus = async (orderId: number, status: string) => {
     try {
       await ordersApi.updateOrderStatus(orderId, status);
+      telegramApi.drainOutbox();
       toast({ title: 'Статус обновлён' });
-      await loadOrders();
     } catch (error) {
       toast({ title: 'Ошибка обновления', variant: 'destructive' });
     }
@@ -116,8 +178,18 @@ const Admin = () => {
 
           <TabsContent value="orders" className="space-y-4">
             <Card>
-              <CardHeader>
+              <CardHeader className="flex flex-row items-center justify-between">
                 <CardTitle className="font-serif">Все заказы ({orders.length})</CardTitle>
+                <div className="flex gap-2">
+                  <Button variant="outline" size="sm" onClick={() => exportOrders('csv')}>
+                    <Icon name="Download" size={16} className="mr-2" />
+                    CSV
+                  </Button>
+                  <Button variant="outline" size="sm" onClick={() => exportOrders('ndjson')}>
+                    <Icon name="Download" size={16} className="mr-2" />
+                    NDJSON
+                  </Button>
+                </div>
               </CardHeader>
               <CardContent>
                 <div className="space-y-4">
@@ -200,19 +272,26 @@ const Admin = () => {
                       </Card>
                     ))
                   )}
+                  {nextCursor && (
+                    <Button variant="outline" className="w-full" onClick={() => loadOrders(nextCursor)}>
+                      Загрузить ещё
+                    </Button>
+                  )}
                 </div>
               </CardContent>
             </Card>
           </TabsContent>
 
-          <TabsContent value="stats">
+          <TabsContent value="stats" className="space-y-6">
             <div className="grid md:grid-cols-3 gap-6">
               <Card>
                 <CardHeader>
-                  <CardTitle className="font-serif">Всего заказов</CardTitle>
+                  <CardTitle className="font-serif">Заказов за 30 дней</CardTitle>
                 </CardHeader>
                 <CardContent>
-                  <p className="text-4xl font-serif">{orders.length}</p>
+                  <p className="text-4xl font-serif">
+                    {summary?.by_status.reduce((sum, s) => sum + Number(s.orders || 0), 0) ?? 0}
+                  </p>
                 </CardContent>
               </Card>
               
@@ -222,7 +301,9 @@ const Admin = () => {
                 </CardHeader>
                 <CardContent>
                   <p className="text-4xl font-serif">
-                    {orders.filter((o: any) => ['pending', 'processing', 'shipped'].includes(o.status)).length}
+                    {summary?.by_status
+                      .filter((s) => ['pending', 'processing', 'shipped'].includes(s.status))
+                      .reduce((sum, s) => sum + Number(s.orders || 0), 0) ?? 0}
                   </p>
                 </CardContent>
               </Card>
@@ -233,14 +314,32 @@ const Admin = () => {
                 </CardHeader>
                 <CardContent>
                   <p className="text-4xl font-serif">
-                    {orders
-                      .filter((o: any) => o.status === 'delivered')
-                      .reduce((sum: number, o: any) => sum + (Number(o.total_amount) || 0), 0)
+                    {(summary?.by_status
+                      .filter((s) => s.status === 'delivered')
+                      .reduce((sum, s) => sum + Number(s.revenue || 0), 0) ?? 0)
                       .toLocaleString('ru-RU')} ₽
                   </p>
                 </CardContent>
               </Card>
             </div>
+
+            <Card>
+              <CardHeader>
+                <CardTitle className="font-serif">Продажи по категориям</CardTitle>
+              </CardHeader>
+              <CardContent className="space-y-2">
+                {summary?.by_category.length ? (
+                  summary.by_category.map((c) => (
+                    <div key={c.category ?? ''} className="flex justify-between text-sm">
+                      <span>{c.category || 'Без категории'} · {c.quantity} шт.</span>
+                      <span className="font-medium">{Number(c.revenue).toLocaleString('ru-RU')} ₽</span>
+                    </div>
+                  ))
+                ) : (
+                  <p className="text-center text-muted-foreground py-4">Продаж пока нет</p>
+                )}
+              </CardContent>
+            </Card>
           </TabsContent>
         </Tabs>
       </div>
@@ -11,6 +11,7 @@ import Icon from '@/components/ui/icon';
 import { AuthDialog } from '@/components/AuthDialog';
 import { authApi, User } from '@/lib/auth';
 import { ordersApi } from '@/lib/orders';
+import { telegramApi } from '@/lib/telegram';
 import { useToast } from '@/hooks/use-toast';
 
 interface Product {
@@ -34,6 +35,7 @@ const Index = () => {
   const [authDialogOpen, setAuthDialogOpen] = useState(false);
   const [user, setUser] = useState<User | null>(null);
   const [checkoutOpen, setCheckoutOpen] = useState(false);
+  const [checkoutKey, setCheckoutKey] = useState<string | null>(null);
   const navigate = useNavigate();
   const { toast } = useToast();
 
@@ -44,6 +46,11 @@ const Index = () => {
     }
   }, []);
 
+  useEffect(() => {
+    // A changed cart is a new checkout attempt and needs its own Idempotency-Key
+    setCheckoutKey(null);
+  }, [cart]);
+
   const products: Product[] = [
     {
       id: 1,
@@ -125,6 +132,11 @@ const Index = () => {
     const delivery_address = formData.get('address') as string;
     const delivery_phone = formData.get('phone') as string;
 
+    // One key per checkout attempt: resubmitting after a failure reuses it, so an order
+    // that was created before the connection dropped is returned instead of duplicated
+    const idempotencyKey = checkoutKey ?? crypto.randomUUID();
+    setCheckoutKey(idempotencyKey);
+
     try {
       await ordersApi.createOrder({
         user_id: user.id,
@@ -133,13 +145,24 @@ const Index = () => {
         delivery_address,
         delivery_phone,
         payment_method: 'card'
-      });
+      }, idempotencyKey);
 
+      telegramApi.drainOutbox();
       toast({ title: 'Заказ оформлен!', description: 'Мы свяжемся с вами в ближайшее время' });
       setCart([]);
+      setCheckoutKey(null);
       setCheckoutOpen(false);
     } catch (error) {
-      toast({ title: 'Ошибка оформления', variant: 'destructive' });
+      const message = error instanceof Error ? error.message : '';
+      let description: string | undefined;
+      if (message === 'Some items are out of stock') {
+        description = 'Некоторых товаров нет в нужном количестве';
+      } else if (message === 'Idempotency-Key was already used for a different request') {
+        // The delivery details changed since the last attempt; the next submit starts a new one
+        setCheckoutKey(null);
+        description = 'Данные заказа изменились. Проверьте заказы в профиле перед повторной отправкой';
+      }
+      toast({ title: 'Ошибка оформления', description, variant: 'destructive' });
     }
   };
 
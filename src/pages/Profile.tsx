@@ -12,6 +12,7 @@ import { Badge } from '@/components/ui/badge';
 const Profile = () => {
   const [user, setUser] = useState<User | null>(null);
   const [orders, setOrders] = useState<Order[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -31,10 +32,11 @@ const Profile = () => {
     }
   };
 
-  const loadOrders = async (userId: number) => {
+  const loadOrders = async (userId: number, cursor?: string) => {
     try {
-      const data = await ordersApi.getOrders(userId);
-      setOrders(data);
+      const data = await ordersApi.getOrders({ userId, cursor });
+      setOrders(cursor ? [...orders, ...data.orders] : data.orders);
+      setNextCursor(data.next_cursor);
     } catch (error) {
       console.error('Failed to load orders:', error);
     }
@@ -143,6 +145,11 @@ const Profile = () => {
                         </CardContent>
                       </Card>
                     ))}
+                    {nextCursor && user && (
+                      <Button variant="outline" className="w-full" onClick={() => loadOrders(user.id, nextCursor)}>
+                        Загрузить ещё
+                      </Button>
+                    )}
                   </div>
                 )}
               </CardContent>